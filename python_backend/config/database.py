@@ -1,29 +1,55 @@
 """
 Database connection pool management
 """
+import orjson
 import psycopg2
+import threading
 from psycopg2 import pool
+from psycopg2.extras import Json, register_default_jsonb
 from contextlib import contextmanager
 from typing import Generator
 from .settings import get_settings
 
 settings = get_settings()
 
-# Connection pool
-connection_pool: pool.SimpleConnectionPool | None = None
+# Connection pool (thread-safe: pipelines query from worker threads)
+connection_pool: pool.ThreadedConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+# Decode JSONB columns with orjson instead of the stdlib json module
+register_default_jsonb(globally=True, loads=orjson.loads)
+
+
+def _dumps_json(value) -> str:
+    return orjson.dumps(value).decode()
+
+
+def to_jsonb(value) -> Json:
+    """Adapt a value for a JSON/JSONB parameter (serialized by the driver with orjson)"""
+    return Json(value, dumps=_dumps_json)
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Pooled connection that remembers which server-side prepared statements it holds"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
 
 
 def init_pool():
     """Initialize the database connection pool"""
     global connection_pool
     
-    if connection_pool is None:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            1,  # minconn
-            settings.database_pool_size,  # maxconn
-            settings.database_url
-        )
-        print(f"Database pool created with {settings.database_pool_size} connections")
+    with _pool_lock:
+        if connection_pool is None:
+            connection_pool = psycopg2.pool.ThreadedConnectionPool(
+                min(settings.database_pool_min_size, settings.database_pool_size),  # minconn
+                settings.database_pool_size,  # maxconn
+                settings.database_url,
+                connection_factory=PooledConnection
+            )
+            print(f"Database pool created with {settings.database_pool_size} connections")
 
 
 def close_pool():
@@ -52,8 +78,30 @@ def get_db_connection() -> Generator:
     conn = connection_pool.getconn()
     try:
         yield conn
+    except Exception:
+        # Don't hand a connection with a failed transaction to the next caller
+        if not conn.closed:
+            conn.rollback()
+        raise
     finally:
-        connection_pool.putconn(conn)
+        connection_pool.putconn(conn, close=bool(conn.closed))
+
+
+def execute_prepared(cursor, name: str, sql: str, params: tuple):
+    """
+    Execute a statement through a per-connection server-side prepared statement
+    
+    The statement is PREPAREd the first time a pooled connection runs it, so
+    Postgres parses and plans it once per connection instead of once per call.
+    `sql` uses $1, $2, ... placeholders.
+    """
+    conn = cursor.connection
+    if name not in conn.prepared_statements:
+        cursor.execute(f"PREPARE {name} AS {sql}")
+        conn.prepared_statements.add(name)
+    
+    placeholders = ', '.join(['%s'] * len(params))
+    cursor.execute(f"EXECUTE {name} ({placeholders})", params)
 
 
 def test_connection():
@@ -14,6 +14,7 @@ class Settings(BaseSettings):
     # Database
     database_url: str
     database_pool_size: int = 20
+    database_pool_min_size: int = 4
     
     # Redis
     redis_url: str
@@ -2,12 +2,13 @@
 Main FastAPI Application
 Innovation Idea Submission Platform - Python Backend
 """
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Request, Form
+from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Request, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple
+from jose import jwt, JWTError
 import uvicorn
 
 from config.settings import get_settings
@@ -35,10 +36,14 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Redis connection failed (non-critical): {e}")
     
+    # Apply active-config invalidations published by other instances
+    await model_config_service.start_invalidation_listener()
+    
     yield
     
     # Shutdown
     print("Shutting down application...")
+    await model_config_service.stop_invalidation_listener()
     close_pool()
     await close_redis_client()
 
@@ -82,6 +87,32 @@ async def get_current_user(request: Request):
     }
 
 
+def decode_access_token(token: str) -> Optional[Dict[str, Any]]:
+    """Claims of a valid, unexpired JWT signed with the app secret, or None"""
+    try:
+        return jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+    except JWTError:
+        return None
+
+
+def websocket_token(websocket: WebSocket) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Bearer token of a WebSocket handshake and the subprotocol to accept
+    
+    Browsers cannot set headers on a WebSocket, so the token comes from
+    ?token=... or from a "bearer, <token>" Sec-WebSocket-Protocol header
+    (in which case "bearer" must be echoed back on accept).
+    """
+    token = websocket.query_params.get('token')
+    if token:
+        return token, None
+    
+    protocols = [p.strip() for p in websocket.headers.get('sec-websocket-protocol', '').split(',')]
+    if len(protocols) == 2 and protocols[0].lower() == 'bearer' and protocols[1]:
+        return protocols[1], protocols[0]
+    return None, None
+
+
 # Health check endpoint removed - was causing too many logs
 
 
@@ -816,6 +847,25 @@ async def get_evaluation_status(user=Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.websocket("/api/evaluation/status/stream")
+async def stream_evaluation_status(websocket: WebSocket):
+    """Push pipeline status to the client on every change"""
+    token, subprotocol = websocket_token(websocket)
+    if not token or decode_access_token(token) is None:
+        await websocket.close(code=1008)  # policy violation
+        return
+    
+    await websocket.accept(subprotocol=subprotocol)
+    try:
+        version, status = evaluation_service.status_snapshot()
+        await websocket.send_json(status)
+        while True:
+            version, status = await evaluation_service.wait_for_status_change(version)
+            await websocket.send_json(status)
+    except WebSocketDisconnect:
+        pass
+
+
 @app.get("/api/ideas/{idea_id}/scores")
 async def get_idea_scores(idea_id: int, user=Depends(get_current_user)):
     """Get evaluation scores and results for a specific idea"""
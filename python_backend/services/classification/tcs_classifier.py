@@ -1,7 +1,7 @@
 """
 TCS Classifier - Classifies hackathon ideas into themes and industries
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, MutableMapping, Optional
 import logging
 import json
 import asyncio
@@ -18,7 +18,8 @@ class TCSClassifier:
         self, 
         provider: Optional[str] = None, 
         model_name: Optional[str] = None,
-        model_settings: Optional[Dict[str, Any]] = None
+        model_settings: Optional[Dict[str, Any]] = None,
+        response_cache: Optional[MutableMapping[str, Dict[str, Any]]] = None
     ):
         """
         Initialize classifier with LLM service
@@ -27,10 +28,12 @@ class TCSClassifier:
             provider: LLM provider (gemini, azure_openai, openai, etc.)
             model_name: Model name to use
             model_settings: Model configuration settings (api_key, endpoint, etc.)
+            response_cache: Store for LLM responses (defaults to the LLM service's in-memory cache)
         """
         self.provider = provider or 'gemini'
         self.model_name = model_name or 'gemini-2.0-flash-exp'
         self.model_settings = model_settings or {}
+        self.response_cache = response_cache
         
     def _ensure_configured(self):
         """Validate configuration"""
@@ -45,6 +48,10 @@ class TCSClassifier:
                 raise ValueError("No API key available. Configure model settings or set GEMINI_API_KEY in .env file")
     
     def classify_idea(self, idea_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Blocking wrapper around aclassify_idea for synchronous callers"""
+        return asyncio.run(self.aclassify_idea(idea_data))
+    
+    async def aclassify_idea(self, idea_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Classify an idea into themes, industry, and technologies
         
@@ -84,21 +91,15 @@ class TCSClassifier:
             logger.info(f"Classifying idea: {idea_data.get('idea_title', 'Unknown')}")
             
             # Use LLM service for classification
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                response = loop.run_until_complete(
-                    llm_service.chat_completion(
-                        provider=self.provider,
-                        model_name=self.model_name,
-                        messages=[{"role": "user", "content": prompt}],
-                        settings=self.model_settings,
-                        temperature=0.3,
-                        max_tokens=1000
-                    )
-                )
-            finally:
-                loop.close()
+            response = await llm_service.chat_completion(
+                provider=self.provider,
+                model_name=self.model_name,
+                messages=[{"role": "user", "content": prompt}],
+                settings=self.model_settings,
+                cache=self.response_cache,
+                temperature=0.3,
+                max_tokens=1000
+            )
             
             if not response.get('success'):
                 raise Exception(response.get('error', 'Unknown error'))
@@ -5,6 +5,23 @@ from typing import Dict, List, Any
 from models.types import ErrorCode
 
 
+# Lowercased submission-template headers -> short field names used once a file is parsed
+HEADER_MAP = {
+    'your idea title': 'idea_title',
+    'brief summary of your idea': 'brief_summary',
+    'challenge/business opportunity being addressed and the ability to scale it across tcs and multiple customers.': 'challenge_opportunity',
+    'novelty of the idea, benefits and risks.': 'novelty_benefits_risks',
+    'highlight adherence to responsible ai principles such as security, fairness, privacy & legal compliance.': 'responsible_ai_adherence',
+    'additional documentation – any additional information or prototype explaining technical approach, architecture, development timeline, success metrics and expected outcomes, and scalability potential. you can also share any research done on business model, competitive analysis, risk & mitigations. sharing relevant artefacts will boost your scores.': 'additional_documentation',
+    'incase you have a second file that could further illustrate your solution, kindly upload the same here.': 'second_file_upload',
+    'your preferred week of participation': 'preferred_week',
+    'your preference for build phase': 'build_phase_preference',
+    'your preference on how you want to  build your idea': 'build_preference',
+    'your preference if you were to develop code': 'code_development_preference',
+    'email': 'submitter_email',
+}
+
+
 class RowError:
     def __init__(self, row_number: int, field: str, error_code: ErrorCode, message: str):
         self.row_number = row_number
@@ -61,7 +78,7 @@ class CSVProcessor:
         errors = []
         
         # Title validation
-        title = row.get('your idea title', '').strip()
+        title = row.get('idea_title', '').strip()
         if not title:
             errors.append(RowError(
                 row_number=row_number,
@@ -78,7 +95,7 @@ class CSVProcessor:
             ))
         
         # Brief summary validation
-        summary = row.get('brief summary of your idea', '').strip()
+        summary = row.get('brief_summary', '').strip()
         if not summary:
             errors.append(RowError(
                 row_number=row_number,
@@ -2,8 +2,9 @@
 Database Manager - Adapted to use connection pool
 """
 from config.database import get_db_connection
-from psycopg2.extras import execute_batch
-from typing import List, Dict
+from psycopg2.extras import execute_batch, execute_values
+from typing import Iterator, List, Dict, Tuple
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,6 +13,17 @@ logger = logging.getLogger(__name__)
 class DatabaseManager:
     """Handle all database operations using connection pool."""
     
+    # WHERE conditions selecting ideas that still need each stage
+    EXTRACTION_PENDING = "(extraction_status IS NULL OR extraction_status = 'pending')"
+    CLASSIFICATION_PENDING = (
+        "extraction_status = 'completed' "
+        "AND (classification_status IS NULL OR classification_status = 'pending' OR classification_status = 'failed')"
+    )
+    EVALUATION_PENDING = (
+        "classification_status = 'completed' "
+        "AND (evaluation_status IS NULL OR evaluation_status = 'pending' OR evaluation_status = 'failed')"
+    )
+    
     def __init__(self, table_name: str):
         self.table_name = table_name
     
@@ -110,7 +122,7 @@ class DatabaseManager:
             try:
                 cursor.execute(f"""
                     SELECT * FROM {self.table_name}
-                    WHERE extraction_status IS NULL OR extraction_status = 'pending'
+                    WHERE {self.EXTRACTION_PENDING}
                 """)
                 rows = cursor.fetchall()
                 columns = [desc[0] for desc in cursor.description]
@@ -125,8 +137,7 @@ class DatabaseManager:
             try:
                 cursor.execute(f"""
                     SELECT * FROM {self.table_name}
-                    WHERE extraction_status = 'completed'
-                    AND (classification_status IS NULL OR classification_status = 'pending' OR classification_status = 'failed')
+                    WHERE {self.CLASSIFICATION_PENDING}
                 """)
                 rows = cursor.fetchall()
                 columns = [desc[0] for desc in cursor.description]
@@ -141,8 +152,7 @@ class DatabaseManager:
             try:
                 cursor.execute(f"""
                     SELECT * FROM {self.table_name}
-                    WHERE classification_status = 'completed'
-                    AND (evaluation_status IS NULL OR evaluation_status = 'pending' OR evaluation_status = 'failed')
+                    WHERE {self.EVALUATION_PENDING}
                 """)
                 rows = cursor.fetchall()
                 columns = [desc[0] for desc in cursor.description]
@@ -150,6 +160,67 @@ class DatabaseManager:
             finally:
                 cursor.close()
     
+    def iter_ideas_for_extraction(self, chunk: int = 500) -> Iterator[Dict]:
+        """Yield ideas that need file extraction, fetched `chunk` rows at a time."""
+        return self._iter_ideas(self.EXTRACTION_PENDING, chunk)
+    
+    def iter_ideas_for_classification(self, chunk: int = 500) -> Iterator[Dict]:
+        """Yield ideas that need classification, fetched `chunk` rows at a time."""
+        return self._iter_ideas(self.CLASSIFICATION_PENDING, chunk)
+    
+    def iter_ideas_for_evaluation(self, chunk: int = 500) -> Iterator[Dict]:
+        """Yield ideas that need evaluation, fetched `chunk` rows at a time."""
+        return self._iter_ideas(self.EVALUATION_PENDING, chunk)
+    
+    def count_ideas_for_extraction(self) -> int:
+        """Count ideas that need file extraction."""
+        return self._count_ideas(self.EXTRACTION_PENDING)
+    
+    def count_ideas_for_classification(self) -> int:
+        """Count ideas that need classification."""
+        return self._count_ideas(self.CLASSIFICATION_PENDING)
+    
+    def count_ideas_for_evaluation(self) -> int:
+        """Count ideas that need evaluation."""
+        return self._count_ideas(self.EVALUATION_PENDING)
+    
+    def _iter_ideas(self, condition: str, chunk: int) -> Iterator[Dict]:
+        """Keyset-paginate over matching ideas by id; no connection is held between chunks."""
+        last_id = 0
+        while True:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(f"""
+                        SELECT * FROM {self.table_name}
+                        WHERE {condition} AND id > %s
+                        ORDER BY id
+                        LIMIT %s
+                    """, (last_id, chunk))
+                    rows = cursor.fetchall()
+                    columns = [desc[0] for desc in cursor.description]
+                finally:
+                    cursor.close()
+            
+            if not rows:
+                return
+            
+            for row in rows:
+                yield dict(zip(columns, row))
+            
+            if len(rows) < chunk:
+                return
+            last_id = rows[-1][columns.index('id')]
+    
+    def _count_ideas(self, condition: str) -> int:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT COUNT(*) FROM {self.table_name} WHERE {condition}")
+                return cursor.fetchone()[0]
+            finally:
+                cursor.close()
+    
     def update_extraction_status(self, idea_id: str, status: str, error_message: str = None):
         """Update extraction status for an idea."""
         with get_db_connection() as conn:
@@ -175,6 +246,29 @@ class DatabaseManager:
             finally:
                 cursor.close()
     
+    def bulk_update_extraction_status(self, statuses: List[Tuple[str, str]]):
+        """Write many (idea_id, status) extraction statuses in one statement."""
+        if not statuses:
+            return
+        
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                execute_values(cursor, f"""
+                    UPDATE {self.table_name} AS t
+                    SET extraction_status = v.status
+                    FROM (VALUES %s) AS v(id, status)
+                    WHERE t.id = v.id
+                """, statuses, template="(%s::int, %s)", page_size=len(statuses))
+                conn.commit()
+                logger.info(f"✓ Saved extraction status for {len(statuses)} idea(s)")
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Failed to update extraction statuses: {e}")
+                raise
+            finally:
+                cursor.close()
+    
     def update_classification(self, idea_id: str, classification: Dict):
         """Update classification results for an idea."""
         with get_db_connection() as conn:
@@ -209,7 +303,6 @@ class DatabaseManager:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             try:
-                import json
                 cursor.execute(f"""
                     UPDATE {self.table_name}
                     SET 
@@ -236,6 +329,86 @@ class DatabaseManager:
             finally:
                 cursor.close()
     
+    def update_classifications_batch(self, results: List[Tuple[str, Dict]]):
+        """Write many (idea_id, classification) results in one statement."""
+        if not results:
+            return
+        
+        rows = [
+            (
+                idea_id,
+                c.get('primary_theme'),
+                c.get('secondary_themes', []),
+                c.get('industry'),
+                c.get('technologies', [])
+            )
+            for idea_id, c in results
+        ]
+        
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                execute_values(cursor, f"""
+                    UPDATE {self.table_name} AS t
+                    SET 
+                        primary_theme = v.primary_theme,
+                        secondary_themes = v.secondary_themes,
+                        industry = v.industry,
+                        technologies = v.technologies,
+                        classification_status = 'completed'
+                    FROM (VALUES %s) AS v(id, primary_theme, secondary_themes, industry, technologies)
+                    WHERE t.id = v.id
+                """, rows, template="(%s::int, %s, %s::text[], %s, %s::text[])", page_size=len(rows))
+                conn.commit()
+                logger.info(f"✓ Saved classification for {len(rows)} idea(s)")
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Failed to update classifications: {e}")
+                raise
+            finally:
+                cursor.close()
+    
+    def update_evaluations_batch(self, results: List[Tuple[str, Dict]]):
+        """Write many (idea_id, evaluation) results in one statement."""
+        if not results:
+            return
+        
+        rows = [
+            (
+                idea_id,
+                e.get('weighted_total'),
+                e.get('investment_recommendation'),
+                e.get('key_strengths', []),
+                e.get('key_concerns', []),
+                json.dumps(e.get('scores', {}))
+            )
+            for idea_id, e in results
+        ]
+        
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                execute_values(cursor, f"""
+                    UPDATE {self.table_name} AS t
+                    SET 
+                        weighted_total_score = v.weighted_total_score,
+                        investment_recommendation = v.investment_recommendation,
+                        key_strengths = v.key_strengths,
+                        key_concerns = v.key_concerns,
+                        rubric_scores = v.rubric_scores,
+                        evaluation_status = 'completed'
+                    FROM (VALUES %s) AS v(id, weighted_total_score, investment_recommendation, key_strengths, key_concerns, rubric_scores)
+                    WHERE t.id = v.id
+                """, rows, template="(%s::int, %s::numeric, %s, %s::text[], %s::text[], %s::jsonb)", page_size=len(rows))
+                conn.commit()
+                logger.info(f"✓ Saved evaluation for {len(rows)} idea(s)")
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Failed to update evaluations: {e}")
+                raise
+            finally:
+                cursor.close()
+    
     def get_active_rubrics(self) -> Dict[str, float]:
         """Get active rubrics with their weights."""
         with get_db_connection() as conn:
@@ -275,6 +448,31 @@ class DatabaseManager:
             finally:
                 cursor.close()
     
+    def mark_failed(self, idea_ids: List[str], status_type: str):
+        """Set a status field to 'failed' for many ideas in one statement"""
+        valid_types = ['extraction_status', 'classification_status', 'evaluation_status']
+        if status_type not in valid_types:
+            raise ValueError(f"Invalid status type: {status_type}")
+        if not idea_ids:
+            return
+        
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"""
+                    UPDATE {self.table_name}
+                    SET {status_type} = 'failed'
+                    WHERE id = ANY(%s::int[])
+                """, (list(idea_ids),))
+                conn.commit()
+                logger.info(f"Marked {cursor.rowcount} idea(s) {status_type}=failed")
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Failed to update {status_type}: {e}")
+                raise
+            finally:
+                cursor.close()
+    
     def get_idea_by_id(self, idea_id: str):
         """Get a specific idea by ID"""
         with get_db_connection() as conn:
@@ -2,8 +2,10 @@
 Evaluation Service - FastAPI wrapper for the evaluation pipeline
 """
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Tuple
+import asyncio
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -16,10 +18,16 @@ class EvaluationService:
             'running': False,
             'stage': None,
             'progress': 0,
+            'stages': None,  # per-stage progress while stages overlap
             'total': 0,
             'completed': 0,
             'failed': 0
         }
+        # Status changes are published through this condition so clients can
+        # await the next transition instead of polling
+        self._status_cond = asyncio.Condition()
+        self._status_version = 0
+        self._loop = None
     
     async def get_evaluation_model_config(self):
         """Get model configuration for evaluation purpose"""
@@ -34,31 +42,28 @@ class EvaluationService:
             with get_db_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
-                    SELECT * FROM model_provider_configs
+                    SELECT name, provider, settings FROM model_provider_configs
                     WHERE is_active = true AND purpose = 'evaluation'
                     LIMIT 1
                 """)
                 row = cursor.fetchone()
                 
                 if row:
-                    columns = [desc[0] for desc in cursor.description]
-                    config = dict(zip(columns, row))
                     cursor.close()
+                    name, provider, settings_raw = row
                     
                     # Parse JSON settings
-                    import json
-                    if isinstance(config.get('settings'), str):
-                        config['settings'] = json.loads(config['settings'])
+                    config_settings = orjson.loads(settings_raw) if isinstance(settings_raw, (str, bytes)) else settings_raw
                     
-                    logger.info(f"Found evaluation config: {config.get('name')}")
-                    logger.info(f"Provider: {config.get('provider')}")
-                    logger.info(f"Config settings keys: {list(config['settings'].keys())}")
+                    logger.info(f"Found evaluation config: {name}")
+                    logger.info(f"Provider: {provider}")
+                    logger.info(f"Config settings keys: {list(config_settings.keys())}")
                     
                     # Return full config for LLM service
                     return {
-                        'provider': config.get('provider'),
-                        'model_name': config['settings'].get('model_name') or config['settings'].get('model', 'gemini-2.0-flash-exp'),
-                        'settings': config['settings']
+                        'provider': provider,
+                        'model_name': config_settings.get('model_name') or config_settings.get('model', 'gemini-2.0-flash-exp'),
+                        'settings': config_settings
                     }
                 
                 cursor.close()
@@ -77,22 +82,46 @@ class EvaluationService:
         raise ValueError("No model configuration found for evaluation. Please activate a model config with purpose='evaluation' or set GEMINI_API_KEY environment variable.")
     
     def _update_progress(self, progress_data: Dict):
-        """Update progress from pipeline callback"""
-        self.status['stage'] = progress_data.get('stage')
-        self.status['progress'] = progress_data.get('progress', 0)
+        """Update progress from pipeline callback (runs on the pipeline worker thread)"""
         logger.info(f"Pipeline progress: {progress_data.get('message')}")
+        asyncio.run_coroutine_threadsafe(
+            self._set_status(
+                stage=progress_data.get('stage'),
+                progress=progress_data.get('progress', 0),
+                stages=progress_data.get('stages')
+            ),
+            self._loop
+        )
+    
+    async def _set_status(self, **changes):
+        """Apply status changes on the event loop and wake any waiting clients"""
+        async with self._status_cond:
+            self.status.update(changes)
+            self._status_version += 1
+            self._status_cond.notify_all()
+    
+    async def wait_for_status_change(self, last_version: int) -> Tuple[int, Dict]:
+        """Wait until the status differs from `last_version`; returns (version, status)"""
+        async with self._status_cond:
+            await self._status_cond.wait_for(lambda: self._status_version != last_version)
+            return self._status_version, dict(self.status)
+    
+    def status_snapshot(self) -> Tuple[int, Dict]:
+        """Current (version, status) pair"""
+        return self._status_version, dict(self.status)
     
     async def start_pipeline(self) -> Dict:
         """Start the evaluation pipeline"""
         if self.status['running']:
             return {'success': False, 'error': 'Pipeline already running'}
         
-        self.status['running'] = True
-        self.status['stage'] = 'initializing'
+        self._loop = asyncio.get_running_loop()
+        await self._set_status(running=True, stage='initializing')
         
         try:
-            from services.extraction.file_extractor import FileExtractor
+            from services.extraction.file_extractor import FileExtractor, UPLOAD_CACHE_TTL
             from services.pipeline.orchestrator import PipelineOrchestrator
+            from services.pipeline.stage_cache import StageCache
             from services.database.db_manager import DatabaseManager
             from config.settings import get_settings
             
@@ -109,7 +138,9 @@ class EvaluationService:
             # Initialize components
             # Note: FileExtractor still uses Gemini directly for vision tasks
             api_key = model_settings.get('api_key', '')
-            file_extractor = FileExtractor(api_key, model=model_name) if api_key else None
+            # SHA-256 of file bytes -> Gemini upload, shared with other runs and processes
+            upload_cache = StageCache('gemini-uploads', ttl=UPLOAD_CACHE_TTL) if api_key else None
+            file_extractor = FileExtractor(api_key, model=model_name, upload_cache=upload_cache) if api_key else None
             db_manager = DatabaseManager('hackathon_ideas')
             
             # Initialize orchestrator
@@ -126,22 +157,31 @@ class EvaluationService:
             
             # Run full pipeline
             logger.info("Starting full evaluation pipeline...")
-            stats = orchestrator.run_full_pipeline()
+            # Run off the event loop so status updates and other requests keep flowing
+            try:
+                stats = await self._loop.run_in_executor(None, orchestrator.run_full_pipeline)
+            finally:
+                orchestrator.close()
+                if file_extractor:
+                    file_extractor.close()
+                    upload_cache.close()
             
-            self.status['running'] = False
-            self.status['stage'] = 'completed'
-            # Show number of ideas processed (not total tasks)
-            # Use the max of succeeded counts since each idea goes through all stages
-            self.status['completed'] = max(
-                stats['extraction']['succeeded'],
-                stats['classification']['succeeded'],
-                stats['evaluation']['succeeded']
-            )
-            # Show number of ideas that failed at any stage
-            self.status['failed'] = max(
-                stats['extraction']['failed'],
-                stats['classification']['failed'],
-                stats['evaluation']['failed']
+            await self._set_status(
+                running=False,
+                stage='completed',
+                # Show number of ideas processed (not total tasks)
+                # Use the max of succeeded counts since each idea goes through all stages
+                completed=max(
+                    stats['extraction']['succeeded'],
+                    stats['classification']['succeeded'],
+                    stats['evaluation']['succeeded']
+                ),
+                # Show number of ideas that failed at any stage
+                failed=max(
+                    stats['extraction']['failed'],
+                    stats['classification']['failed'],
+                    stats['evaluation']['failed']
+                )
             )
             
             logger.info("Pipeline completed successfully!")
@@ -153,8 +193,7 @@ class EvaluationService:
             
         except Exception as e:
             logger.error(f"Pipeline failed: {e}", exc_info=True)
-            self.status['running'] = False
-            self.status['stage'] = 'failed'
+            await self._set_status(running=False, stage='failed')
             return {'success': False, 'error': str(e)}
     
     async def get_status(self) -> Dict:
@@ -163,12 +202,12 @@ class EvaluationService:
     
     async def get_idea_scores(self, idea_id: int) -> Dict:
         """Get evaluation results for a specific idea"""
-        from config.database import get_db_connection
+        from config.database import get_db_connection, execute_prepared
         
         try:
             with get_db_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
+                execute_prepared(cursor, 'idea_scores', """
                     SELECT 
                         weighted_total_score,
                         investment_recommendation,
@@ -183,7 +222,7 @@ class EvaluationService:
                         classification_status,
                         evaluation_status
                     FROM hackathon_ideas
-                    WHERE id = %s
+                    WHERE id = $1::int
                 """, (idea_id,))
                 
                 row = cursor.fetchone()
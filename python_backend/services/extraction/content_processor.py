@@ -44,10 +44,11 @@ class ContentProcessor:
         file_types = []
         content_types = []  # Track content type from each file
         
-        for file_path in files:
+        # Upload of upcoming files overlaps with generation of the current one
+        for file_path, result in self.extractor.extract_batch(files, prefetch=self.max_file_workers):
             try:
-                # ✅ Single API call returns both content AND type
-                result = self.extractor.extract_content(file_path)
+                if isinstance(result, Exception):
+                    raise result
                 
                 combined_content.append(f"\n--- Content from {file_path.name} ---\n{result['content']}\n")
                 content_types.append(result['content_type'])
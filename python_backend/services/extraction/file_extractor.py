@@ -1,28 +1,74 @@
 import google.generativeai as genai
+import hashlib
+import io
 import json
 from pathlib import Path
 import subprocess
 import platform
 import logging
+import threading
 import cv2
-from typing import Dict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, MutableMapping, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Gemini keeps uploaded files for 48h; reuse handles slightly before that
+UPLOAD_CACHE_TTL = 47 * 3600
+
 
 class FileExtractor:
     """Enhanced file extractor with combined content extraction and prototype detection"""
     
-    def __init__(self, api_key: str, model: str = "gemini-2.0-flash-exp"):
-        genai.configure(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gemini-2.0-flash-exp",
+        prefetch_workers: int = 8,
+        upload_cache: Optional[MutableMapping[str, Dict[str, str]]] = None
+    ):
+        """
+        Args:
+            api_key: Gemini API key
+            model: Gemini model used for extraction
+            prefetch_workers: Threads preparing and uploading files ahead of
+                generation, shared by all concurrent extract_batch calls
+            upload_cache: SHA-256 of file bytes -> Gemini upload, owned by the
+                caller (e.g. a StageCache shared with other extractors and
+                processes); in-memory for this extractor when omitted
+        """
+        self._api_key = api_key
         self.model = model
+        self._upload_cache = upload_cache if upload_cache is not None else {}
         self._client = None
+        self._client_lock = threading.Lock()
+        self._prefetch_executor = ThreadPoolExecutor(
+            max_workers=max(1, prefetch_workers),
+            thread_name_prefix='extract-prefetch'
+        )
+    
+    def close(self):
+        """Shut down the prefetch pool once the extractor is no longer needed"""
+        self._prefetch_executor.shutdown(wait=True)
     
     def _get_client(self):
-        """Lazy load Gemini client"""
-        if self._client is None:
-            self._client = genai.GenerativeModel(model_name=self.model)
-        return self._client
+        """
+        Lazy load this extractor's Gemini client
+        
+        google-generativeai keeps the API key in process-global configuration
+        (also used by upload_file/get_file), so the key is applied when the
+        client is created and extractors with different keys must not run
+        at the same time.
+        """
+        with self._client_lock:
+            if self._client is None:
+                genai.configure(api_key=self._api_key)
+                self._client = genai.GenerativeModel(model_name=self.model)
+            return self._client
     
     def extract_content(self, file_path: Path) -> Dict[str, str]:
         """
@@ -33,6 +79,45 @@ class FileExtractor:
             "content_type": "Prototype" or "Text"
         }
         """
+        return self._upload_content(file_path)()
+    
+    def extract_batch(self, file_paths: List[Path], prefetch: int = 3) -> Iterator[Tuple[Path, Any]]:
+        """
+        Extract multiple files, preparing and uploading up to `prefetch` files
+        ahead while Gemini generates content for the current one
+        
+        Yields (file_path, result) in input order, where result is the
+        extract_content dict or the exception raised while preparing the file
+        """
+        paths = iter(file_paths)
+        executor = self._prefetch_executor
+        
+        pending = deque(
+            (path, executor.submit(self._upload_content, path))
+            for path in islice(paths, max(1, prefetch))
+        )
+        
+        try:
+            while pending:
+                file_path, future = pending.popleft()
+                
+                # Keep the prefetch window full while this file generates
+                for next_path in islice(paths, 1):
+                    pending.append((next_path, executor.submit(self._upload_content, next_path)))
+                
+                try:
+                    result = future.result()()
+                except Exception as e:
+                    result = e
+                
+                yield file_path, result
+        finally:
+            # Abandoned early: don't leave this batch's uploads queued on the shared pool
+            for _, future in pending:
+                future.cancel()
+    
+    def _upload_content(self, file_path: Path) -> Callable[[], Dict[str, str]]:
+        """Prepare and upload a file, returning the generation step that completes extraction"""
         
         logger.info(f"Extracting file: {file_path}")
         
@@ -43,22 +128,47 @@ class FileExtractor:
         
         # Handle video files with frame extraction
         if extension in ['.mp4', '.mov', '.avi', '.mkv']:
-            return self._extract_video_with_frames(file_path)
+            return self._upload_video_frames(file_path)
         
         # Handle other files
         file_path, mime_type = self._prepare_file(file_path)
         
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-        
         # ✅ Combined prompt: extraction + classification in one call
         prompt = self._create_combined_prompt(file_path.name)
         
+        client = self._get_client()
+        # Upload file to Gemini (reusing a previous upload of identical bytes)
+        uploaded_file = self._upload_file_cached(file_path, mime_type)
+        
+        return partial(self._generate_file_content, client, [uploaded_file, prompt])
+    
+    def _upload_file_cached(self, file_path: Path, mime_type: str):
+        """Upload a file to Gemini, reusing the handle of an earlier upload with the same SHA-256"""
+        with open(file_path, 'rb') as f:
+            digest = hashlib.file_digest(f, 'sha256').hexdigest()
+        
+        # A shared StageCache expires entries UPLOAD_CACHE_TTL after the upload
+        cached = self._upload_cache.get(digest)
+        
+        if cached:
+            try:
+                uploaded_file = genai.get_file(cached['name'])
+                logger.info(f"    ♻ Reusing uploaded file {cached['name']}")
+                return uploaded_file
+            except Exception as e:
+                logger.warning(f"    ⚠ Cached upload {cached['name']} unavailable, re-uploading: {e}")
+        
+        uploaded_file = genai.upload_file(file_path, mime_type=mime_type)
+        
+        # A StageCache write is a single-row upsert, so concurrent extractors never overwrite each other's entries
+        self._upload_cache[digest] = {'name': uploaded_file.name}
+        
+        return uploaded_file
+    
+    def _generate_file_content(self, client, contents: list) -> Dict[str, str]:
+        """Run the combined extraction + classification call for an uploaded file"""
         try:
-            client = self._get_client()
-            # Upload file to Gemini
-            uploaded_file = genai.upload_file(file_path, mime_type=mime_type)
-            response = client.generate_content([uploaded_file, prompt])
+            response = client.generate_content(contents)
             
             response_text = response.text.strip()
             
@@ -88,30 +198,27 @@ class FileExtractor:
                 'content_type': 'Text'
             }
     
-    def _extract_video_with_frames(self, video_path: Path) -> Dict[str, str]:
-        """Extract frames from video and analyze with single API call"""
+    def _upload_video_frames(self, video_path: Path) -> Callable[[], Dict[str, str]]:
+        """Extract and upload video frames, returning the single analysis call to run next"""
         
         logger.info(f"  📹 Extracting frames from video every 10 seconds...")
         
         frames = self._extract_frames_every_n_seconds(video_path, interval_seconds=10)
         
         if not frames:
-            return {
+            return lambda: {
                 'content': "Video analysis failed: No frames extracted",
                 'content_type': 'Text'
             }
         
         logger.info(f"  ✓ Extracted {len(frames)} frames from video")
         
-        # Save frames temporarily and upload
-        import tempfile
-        frame_files = []
-        for idx, frame_data in enumerate(frames):
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-            temp_file.write(frame_data)
-            temp_file.close()
-            uploaded = genai.upload_file(temp_file.name, mime_type="image/jpeg")
-            frame_files.append(uploaded)
+        # Upload frames straight from memory (client creation configures the API key)
+        client = self._get_client()
+        uploaded_frames = [
+            genai.upload_file(io.BytesIO(frame_data), mime_type="image/jpeg")
+            for frame_data in frames
+        ]
         
         # ✅ Combined prompt for video
         prompt = f"""
@@ -134,22 +241,13 @@ Return JSON:
 }}
 """
         
-        contents = frame_files + [prompt]
-        
+        return partial(self._generate_video_content, client, uploaded_frames + [prompt])
+    
+    def _generate_video_content(self, client, contents: list) -> Dict[str, str]:
+        """Analyze uploaded video frames with a single API call"""
         try:
-            client = self._get_client()
             response = client.generate_content(contents)
             
-            # Clean up temp files
-            import os
-            for uploaded in frame_files:
-                try:
-                    temp_path = uploaded.name
-                    if os.path.exists(temp_path):
-                        os.unlink(temp_path)
-                except:
-                    pass
-            
             response_text = response.text.strip()
             if response_text.startswith("```json"):
                 response_text = response_text.replace("```json", "").replace("```", "")
@@ -172,8 +270,8 @@ Return JSON:
         frames = []
         
         try:
-            cap = cv2.VideoCapture(str(video_path))
-            
+            cap = self._open_video_capture(video_path)
+
             if not cap.isOpened():
                 logger.error(f"Could not open video: {video_path}")
                 return frames
@@ -186,7 +284,8 @@ Return JSON:
             
             frame_interval = int(fps * interval_seconds)
             frame_count = 0
-            extracted_count = 0
+            kept_timestamps = []
+            log_each_frame = logger.isEnabledFor(logging.DEBUG)
             
             while True:
                 ret, frame = cap.read()
@@ -197,19 +296,42 @@ Return JSON:
                     success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
                     if success:
                         frames.append(buffer.tobytes())
-                        extracted_count += 1
                         timestamp = frame_count / fps
-                        logger.info(f"    Frame {extracted_count} @ {timestamp:.1f}s")
+                        kept_timestamps.append(timestamp)
+                        if log_each_frame:
+                            logger.debug("    Frame %d @ %.1fs", len(kept_timestamps), timestamp)
                 
                 frame_count += 1
             
             cap.release()
             
+            logger.info(
+                "    Extracted %d frames at %s",
+                len(kept_timestamps), [f'{t:.1f}s' for t in kept_timestamps]
+            )
+            
         except Exception as e:
             logger.error(f"  ✗ Frame extraction failed: {e}")
         
         return frames
-    
+
+    def _open_video_capture(self, video_path: Path):
+        """Open video with FFMPEG hardware-accelerated decode, falling back to default backend"""
+        cap = cv2.VideoCapture(
+            str(video_path),
+            cv2.CAP_FFMPEG,
+            [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        )
+
+        if not cap.isOpened():
+            cap.release()
+            cap = cv2.VideoCapture(str(video_path))
+
+        if cap.isOpened():
+            logger.info(f"    Video backend: {cap.getBackendName()}")
+
+        return cap
+
     def _create_combined_prompt(self, filename: str) -> str:
         return f"""
 CRITICAL: You MUST extract detailed content AND classify the type.
@@ -242,18 +364,16 @@ CRITICAL: The "content" field MUST contain the full detailed extraction. Do not
     
     def _prepare_file(self, file_path: Path) -> tuple:
         """Convert unsupported formats to PDF"""
-        extension = file_path.suffix.lower()
-        mime_type = self._get_mime_type(extension)
-        
-        if extension in ['.pptx', '.docx']:
-            logger.info(f"    🔄 Converting {extension.upper()} to PDF...")
-            pdf_path = self._convert_to_pdf(file_path)
-            return pdf_path, 'application/pdf'
-        
-        return file_path, mime_type
+        mime_type, prepare = MIME_TABLE.get(file_path.suffix.lower(), DEFAULT_MIME_ENTRY)
+        return prepare(self, file_path), mime_type
+    
+    def _passthrough(self, file_path: Path) -> Path:
+        """Files Gemini accepts natively are uploaded as-is"""
+        return file_path
     
     def _convert_to_pdf(self, file_path: Path) -> Path:
         """Convert PPTX/DOCX to PDF using LibreOffice"""
+        logger.info(f"    🔄 Converting {file_path.suffix.upper()} to PDF...")
         output_pdf = file_path.with_suffix('.converted.pdf')
         
         if output_pdf.exists():
@@ -288,22 +408,27 @@ CRITICAL: The "content" field MUST contain the full detailed extraction. Do not
             from reportlab.pdfgen import canvas
             
             prs = Presentation(file_path)
+            
+            # Slides are independent, so collect their text in parallel
+            with ThreadPoolExecutor() as executor:
+                slide_texts = list(executor.map(self._slide_texts, prs.slides))
+            
+            # ReportLab's canvas is not thread-safe; draw serially
             c = canvas.Canvas(str(output_pdf), pagesize=letter)
             width, height = letter
             
-            for slide_num, slide in enumerate(prs.slides, 1):
+            for slide_num, texts in enumerate(slide_texts, 1):
                 c.setFont("Helvetica-Bold", 14)
                 c.drawString(50, height - 50, f"Slide {slide_num}")
                 y = height - 80
                 c.setFont("Helvetica", 10)
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text.strip():
-                        for line in shape.text.split('\n'):
-                            if y < 100:
-                                c.showPage()
-                                y = height - 80
-                            c.drawString(50, y, line[:100])
-                            y -= 15
+                for text in texts:
+                    for line in text.split('\n'):
+                        if y < 100:
+                            c.showPage()
+                            y = height - 80
+                        c.drawString(50, y, line[:100])
+                        y -= 15
                 c.showPage()
             c.save()
             return output_pdf
@@ -326,12 +451,28 @@ CRITICAL: The "content" field MUST contain the full detailed extraction. Do not
             pdf.build(story)
             return output_pdf
     
-    def _get_mime_type(self, extension: str) -> str:
-        """Get MIME type from extension"""
-        mime_types = {
-            '.pdf': 'application/pdf',
-            '.mp4': 'video/mp4', '.mov': 'video/quicktime', '.avi': 'video/x-msvideo',
-            '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
-            '.webp': 'image/webp', '.gif': 'image/gif'
-        }
-        return mime_types.get(extension, 'application/octet-stream')
+    @staticmethod
+    def _slide_texts(slide) -> List[str]:
+        """Non-empty text of each shape on a slide"""
+        return [
+            shape.text for shape in slide.shapes
+            if hasattr(shape, "text") and shape.text.strip()
+        ]
+
+
+# Extension -> (MIME type sent to Gemini, FileExtractor method that prepares the file);
+# defined after the class so it can hold the functions themselves
+MIME_TABLE = MappingProxyType({
+    '.pdf': ('application/pdf', FileExtractor._passthrough),
+    '.pptx': ('application/pdf', FileExtractor._convert_to_pdf),
+    '.docx': ('application/pdf', FileExtractor._convert_to_pdf),
+    '.mp4': ('video/mp4', FileExtractor._passthrough),
+    '.mov': ('video/quicktime', FileExtractor._passthrough),
+    '.avi': ('video/x-msvideo', FileExtractor._passthrough),
+    '.jpg': ('image/jpeg', FileExtractor._passthrough),
+    '.jpeg': ('image/jpeg', FileExtractor._passthrough),
+    '.png': ('image/png', FileExtractor._passthrough),
+    '.webp': ('image/webp', FileExtractor._passthrough),
+    '.gif': ('image/gif', FileExtractor._passthrough),
+})
+DEFAULT_MIME_ENTRY = ('application/octet-stream', FileExtractor._passthrough)
@@ -2,11 +2,254 @@
 LLM Service - Multi-provider LLM integration using LiteLLM
 Supports 100+ LLM providers through a unified interface
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, AsyncIterator, MutableMapping, Optional, Tuple
+from dataclasses import dataclass
 import litellm
-from litellm import completion, acompletion
+from litellm import acompletion
+from cachetools import TTLCache
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from functools import lru_cache
+import asyncio
+import hashlib
 import json
-import os
+import logging
+import numpy as np
+import operator
+import orjson
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Configure LiteLLM once per process; drop_params is also passed per call
+if not getattr(litellm, '_hackathon_configured', False):
+    litellm.drop_params = True  # Drop unsupported params instead of erroring
+    litellm.set_verbose = False  # Disable verbose logging
+    litellm._hackathon_configured = True
+
+# Responses are only reused when sampling is (near) deterministic
+CACHEABLE_MAX_TEMPERATURE = 0.3
+
+# Transient provider errors: retried with backoff and counted by the circuit breaker
+_TRANSIENT_ERRORS = (
+    litellm.RateLimitError,
+    litellm.APIConnectionError,
+    litellm.Timeout,
+    litellm.InternalServerError,
+    litellm.ServiceUnavailableError,
+)
+
+# Requests per minute allowed per (provider, API key) unless settings['qpm'] is set
+_DEFAULT_QPM = {'openai': 3500, 'azure': 240, 'gemini': 1000, 'anthropic': 1000}
+_FALLBACK_QPM = 500
+
+# Cosine similarity above which a semantically cached response is reused
+SEMANTIC_CACHE_THRESHOLD = 0.97
+
+# settings keys for the semantic cache's embedding model and its own credentials
+_EMBEDDING_SETTINGS = {
+    'embedding_model': 'model',
+    'embedding_api_key': 'api_key',
+    'embedding_api_base': 'api_base',
+    'embedding_api_version': 'api_version',
+}
+
+# JSON object inside an optional ```json fence
+_FENCE_RE = re.compile(r"```(?:json)?\s*(\{.*\})\s*```", re.S)
+
+# (prompt_tokens, completion_tokens, total_tokens) from a LiteLLM usage object
+_USAGE_GET = operator.attrgetter('prompt_tokens', 'completion_tokens', 'total_tokens')
+
+# Numbers that must match for a semantic cache hit
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _api_key_hash(settings: Dict[str, Any]) -> str:
+    """Short fingerprint of the configured API key (the key itself is never stored)"""
+    return hashlib.blake2b((settings.get('api_key') or '').encode(), digest_size=8).hexdigest()
+
+
+def _message_text(messages: List[Dict[str, Any]]) -> str:
+    """Concatenated text of all messages, including block-form content"""
+    parts = []
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, list):
+            parts.extend(block.get('text', '') for block in content if isinstance(block, dict))
+        elif content:
+            parts.append(str(content))
+    return "\n".join(parts)
+
+
+class SemanticCache:
+    """
+    In-memory nearest-neighbour cache of completions keyed by prompt embedding
+    
+    Entries are partitioned by scope (provider, model, sampling params) and
+    matched by cosine similarity of unit-length embeddings. A match also
+    requires the same numbers to appear in both prompts, since embeddings
+    barely separate "score 3" from "score 4" or one date from another.
+    """
+    
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = 2048):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._vectors: Dict[Tuple, np.ndarray] = {}
+        self._entries: Dict[Tuple, List[Tuple[Tuple[str, ...], Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+    
+    def lookup(self, scope: Tuple, embedding: np.ndarray, prompt_text: str) -> Optional[Dict[str, Any]]:
+        """Cached response for the most similar prompt above the threshold"""
+        with self._lock:
+            vectors = self._vectors.get(scope)
+            if vectors is None:
+                return None
+            scores = vectors @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            numbers, response = self._entries[scope][best]
+        
+        if numbers != tuple(_NUMBER_RE.findall(prompt_text)):
+            return None
+        return response
+    
+    def add(self, scope: Tuple, embedding: np.ndarray, prompt_text: str, response: Dict[str, Any]):
+        """Store a response; the oldest entries in the scope are evicted first"""
+        entry = (tuple(_NUMBER_RE.findall(prompt_text)), response)
+        with self._lock:
+            vectors = self._vectors.get(scope)
+            entries = self._entries.setdefault(scope, [])
+            vectors = embedding[None, :] if vectors is None else np.vstack([vectors, embedding])
+            entries.append(entry)
+            if len(entries) > self.max_entries:
+                vectors = vectors[-self.max_entries:]
+                del entries[:-self.max_entries]
+            self._vectors[scope] = vectors
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one provider
+    
+    Opens after `failure_threshold` transient failures in a row. Once
+    `reset_timeout` seconds have passed, a single trial call is let through
+    (half-open); its outcome closes the breaker or opens it again.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Whether a call may go out now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial_in_flight and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+def _retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Retry-After (in seconds) from a provider error response, if present"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+_backoff = wait_exponential_jitter(initial=1, max=30)
+
+
+def _retry_wait(retry_state) -> float:
+    """Backoff between attempts; a 429 with Retry-After is paced by the rate limiter instead"""
+    error = retry_state.outcome.exception()
+    if isinstance(error, litellm.RateLimitError) and _retry_after_seconds(error) is not None:
+        return 0
+    return _backoff(retry_state)
+
+
+async def _acompletion_with_retry(bucket: "AsyncTokenBucket", **kwargs):
+    """
+    acompletion() through a rate limiter, retried on transient errors
+    
+    Every attempt takes a token from `bucket`. A rate-limit response slows
+    the bucket down and pauses it for the provider's Retry-After, so all
+    callers sharing the key back off together instead of retrying blindly.
+    """
+    async for attempt in AsyncRetrying(
+        stop=stop_after_attempt(5),
+        wait=_retry_wait,
+        retry=retry_if_exception_type(_TRANSIENT_ERRORS),
+        reraise=True
+    ):
+        with attempt:
+            await bucket.acquire()
+            try:
+                response = await acompletion(**kwargs)
+            except litellm.RateLimitError as e:
+                bucket.penalize(_retry_after_seconds(e))
+                raise
+            bucket.recover()
+            return response
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """How LiteLLM addresses one provider family"""
+    name: str
+    model_prefix: str = ""
+    endpoint_aliases: Tuple[str, ...] = ()  # settings keys for the API base, in priority order
+    uses_deployment: bool = False  # model string is the deployment name (Azure)
+    requires_endpoint: bool = False
+
+
+# Matched in order against the lowercased provider name; azure must win over 'openai'
+_PROVIDER_SPECS: Dict[Tuple[str, ...], ProviderSpec] = {
+    ('azure',): ProviderSpec(
+        'azure', 'azure/', ('azure_endpoint', 'endpoint', 'api_base'),
+        uses_deployment=True, requires_endpoint=True
+    ),
+    ('gemini', 'google'): ProviderSpec('gemini', 'gemini/'),
+    ('claude', 'anthropic'): ProviderSpec('anthropic'),
+    ('openai', 'gpt'): ProviderSpec('openai'),
+}
+_DEFAULT_PROVIDER_SPEC = ProviderSpec('default')
+
+
+@lru_cache(maxsize=64)
+def _resolve_provider(provider: str) -> ProviderSpec:
+    """Provider spec for a configured provider name (e.g. 'azure_openai')"""
+    provider_lower = provider.lower()
+    return next(
+        (spec for keys, spec in _PROVIDER_SPECS.items() if any(k in provider_lower for k in keys)),
+        _DEFAULT_PROVIDER_SPEC
+    )
 
 
 class LLMService:
@@ -15,10 +258,19 @@ class LLMService:
     Supports: OpenAI, Azure OpenAI, Google Gemini, Anthropic Claude, and 100+ more providers
     """
     
-    def __init__(self):
-        # Configure LiteLLM
-        litellm.drop_params = True  # Drop unsupported params instead of erroring
-        litellm.set_verbose = False  # Disable verbose logging
+    # Process-local cache of successful low-temperature completions
+    _response_cache: MutableMapping[str, Dict[str, Any]] = TTLCache(maxsize=1024, ttl=3600)
+    _response_cache_lock = threading.Lock()
+    # Near-duplicate prompt cache, used when chat_completion(semantic_cache=True)
+    _semantic_cache = SemanticCache()
+    
+    # One circuit breaker per provider, shared by all instances
+    _breakers: Dict[str, CircuitBreaker] = {}
+    _breakers_lock = threading.Lock()
+    
+    # One request-rate limiter per (provider, API key), shared by all instances
+    _buckets: Dict[Tuple[str, str], "AsyncTokenBucket"] = {}
+    _buckets_lock = threading.Lock()
     
     def _build_model_string(
         self,
@@ -32,61 +284,40 @@ class LLMService:
         LiteLLM uses format: provider/deployment_name
         For Azure, we need the deployment name from settings
         """
-        provider_lower = provider.lower()
+        spec = _resolve_provider(provider)
         
-        # Azure OpenAI - use deployment name if available
-        if 'azure' in provider_lower:
+        if spec.uses_deployment:
             # Azure needs deployment name, not model name
-            deployment = settings.get('deployment_name') or settings.get('model') or model_name
-            return f"azure/{deployment}"
+            model_name = settings.get('deployment_name') or settings.get('model') or model_name
         
-        # Google Gemini
-        elif 'gemini' in provider_lower or 'google' in provider_lower:
-            return f"gemini/{model_name}"
+        return f"{spec.model_prefix}{model_name}"
+    
+    def _credential_kwargs(self, provider: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Per-request credentials for LiteLLM
         
-        # Anthropic Claude
-        elif 'claude' in provider_lower or 'anthropic' in provider_lower:
-            return model_name  # Claude models don't need prefix
+        Passed as acompletion() kwargs rather than os.environ so concurrent
+        requests with different providers/keys cannot overwrite each other.
+        """
+        spec = _resolve_provider(provider)
+        kwargs = {}
         
-        # OpenAI
-        elif 'openai' in provider_lower or 'gpt' in provider_lower:
-            return model_name  # OpenAI models don't need prefix
+        if settings.get('api_key'):
+            kwargs['api_key'] = settings['api_key']
         
-        # Default
-        else:
-            return model_name
+        # Azure requires api_base and api_version
+        endpoint = self._endpoint(spec, settings)
+        if endpoint:
+            kwargs['api_base'] = endpoint
+        if spec.uses_deployment and settings.get('api_version'):
+            kwargs['api_version'] = settings['api_version']
+        
+        return kwargs
     
-    def _prepare_env_vars(self, provider: str, settings: Dict[str, Any]):
-        """
-        Set environment variables required by LiteLLM for the provider
-        """
-        provider_lower = provider.lower()
-        
-        # Azure OpenAI
-        if 'azure' in provider_lower:
-            if settings.get('api_key'):
-                os.environ['AZURE_API_KEY'] = settings['api_key']
-            # Get endpoint from any of these keys
-            endpoint = settings.get('azure_endpoint') or settings.get('endpoint') or settings.get('api_base')
-            if endpoint:
-                os.environ['AZURE_API_BASE'] = endpoint
-            if settings.get('api_version'):
-                os.environ['AZURE_API_VERSION'] = settings['api_version']
-        
-        # Google Gemini
-        elif 'gemini' in provider_lower or 'google' in provider_lower:
-            if settings.get('api_key'):
-                os.environ['GEMINI_API_KEY'] = settings['api_key']
-        
-        # Anthropic Claude
-        elif 'claude' in provider_lower or 'anthropic' in provider_lower:
-            if settings.get('api_key'):
-                os.environ['ANTHROPIC_API_KEY'] = settings['api_key']
-        
-        # OpenAI
-        elif 'openai' in provider_lower or 'gpt' in provider_lower:
-            if settings.get('api_key'):
-                os.environ['OPENAI_API_KEY'] = settings['api_key']
+    @staticmethod
+    def _endpoint(spec: ProviderSpec, settings: Dict[str, Any]) -> Optional[str]:
+        """First configured endpoint among the provider's alias keys"""
+        return next((settings[k] for k in spec.endpoint_aliases if settings.get(k)), None)
     
     async def test_model(
         self,
@@ -113,24 +344,21 @@ class LLMService:
             print(f"[LLM Service] Settings keys: {list(settings.keys())}")
             
             # Validate required settings for Azure
-            if 'azure' in provider.lower():
+            spec = _resolve_provider(provider)
+            if spec.requires_endpoint:
                 if not settings.get('api_key'):
                     return {
                         'success': False,
                         'message': 'Azure API key is required',
                         'error': 'Missing api_key in settings'
                     }
-                # Check for endpoint in any of these keys
-                if not (settings.get('api_base') or settings.get('azure_endpoint') or settings.get('endpoint')):
+                if not self._endpoint(spec, settings):
                     return {
                         'success': False,
                         'message': 'Azure endpoint is required',
-                        'error': 'Missing api_base, azure_endpoint, or endpoint in settings'
+                        'error': f"Missing {', '.join(spec.endpoint_aliases)} in settings"
                     }
             
-            # Prepare environment variables
-            self._prepare_env_vars(provider, settings)
-            
             # Build model string
             model_string = self._build_model_string(provider, model_name, settings)
             print(f"[LLM Service] Model string: {model_string}")
@@ -140,37 +368,28 @@ class LLMService:
                 'model': model_string,
                 'messages': [{"role": "user", "content": prompt}],
                 'max_tokens': 100,
-                'temperature': 0.7
+                'temperature': 0.7,
+                'drop_params': True,
+                **self._credential_kwargs(provider, settings)
             }
             
-            # Add provider-specific parameters
-            if 'azure' in provider.lower():
-                # Get endpoint from any of these keys
-                endpoint = settings.get('azure_endpoint') or settings.get('endpoint') or settings.get('api_base')
-                
-                # Azure requires api_base and api_version
-                if endpoint:
-                    kwargs['api_base'] = endpoint
-                
-                if settings.get('api_version'):
-                    kwargs['api_version'] = settings['api_version']
-                
-                print(f"[LLM Service] Azure kwargs: {kwargs}")
-            
             # Send test message using LiteLLM
             response = await acompletion(**kwargs)
             
             # Check if response is valid
-            if response and response.choices and len(response.choices) > 0:
+            if response and response.choices:
+                prompt_tokens, completion_tokens, total_tokens = (
+                    _USAGE_GET(response.usage) if response.usage else (0, 0, 0)
+                )
                 return {
                     'success': True,
                     'message': f"Model '{model_name}' responded correctly!",
                     'response': response.choices[0].message.content,
                     'model': response.model,
                     'usage': {
-                        'prompt_tokens': response.usage.prompt_tokens if response.usage else 0,
-                        'completion_tokens': response.usage.completion_tokens if response.usage else 0,
-                        'total_tokens': response.usage.total_tokens if response.usage else 0
+                        'prompt_tokens': prompt_tokens,
+                        'completion_tokens': completion_tokens,
+                        'total_tokens': total_tokens
                     }
                 }
             else:
@@ -195,6 +414,9 @@ class LLMService:
         settings: Dict[str, Any],
         temperature: float = 0.7,
         max_tokens: int = 1000,
+        cache: Optional[MutableMapping[str, Dict[str, Any]]] = None,
+        stream: bool = False,
+        semantic_cache: bool = False,
         **kwargs
     ) -> Dict[str, Any]:
         """
@@ -207,17 +429,53 @@ class LLMService:
             settings: Provider settings (api_key, api_base, etc.)
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
+            cache: Response store to use instead of the shared in-memory cache
+                (any thread-safe mapping, e.g. a diskcache.Cache); accessed from
+                a worker thread
+            stream: Receive the response as a token stream and reassemble it
+                (same return shape; use chat_completion_stream for partial text)
+            semantic_cache: On an exact-cache miss, reuse the response of a
+                near-identical earlier prompt (embedding similarity); only
+                applies when settings name an embedding_model and its
+                embedding_api_key (plus embedding_api_base/_api_version)
             **kwargs: Additional parameters
         
         Returns:
             Dict with response or error
         """
         try:
-            # Prepare environment variables
-            self._prepare_env_vars(provider, settings)
-            
             # Build model string
             model_string = self._build_model_string(provider, model_name, settings)
+            credentials = self._credential_kwargs(provider, settings)
+            
+            # Serve repeated deterministic requests without a network call
+            cacheable = temperature <= CACHEABLE_MAX_TEMPERATURE and not stream
+            embedding = None
+            if cacheable:
+                cache_key = self._response_cache_key(
+                    provider, model_string, credentials, messages, temperature, max_tokens, kwargs
+                )
+                if cache is None:
+                    with self._response_cache_lock:
+                        cached = self._response_cache.get(cache_key)
+                else:
+                    # Caller-supplied stores may do disk I/O; keep it off the event loop
+                    cached = await asyncio.to_thread(cache.get, cache_key)
+                if cached is not None:
+                    return cached
+                
+                embedding_kwargs = self._embedding_kwargs(settings) if semantic_cache else None
+                if embedding_kwargs:
+                    prompt_text = _message_text(messages)
+                    scope = (
+                        provider, model_string, _api_key_hash(credentials), credentials.get('api_base'),
+                        temperature, max_tokens
+                    )
+                    embedding = await self._embed(prompt_text, embedding_kwargs)
+                    if embedding is not None:
+                        cached = self._semantic_cache.lookup(scope, embedding, prompt_text)
+                        if cached is not None:
+                            return cached
             
             # Prepare kwargs for LiteLLM
             litellm_kwargs = {
@@ -225,46 +483,47 @@ class LLMService:
                 'messages': messages,
                 'temperature': temperature,
                 'max_tokens': max_tokens,
+                'drop_params': True,
+                **credentials,
                 **kwargs
             }
             
-            # Add provider-specific parameters
-            if 'azure' in provider.lower():
-                # Get endpoint from any of these keys
-                endpoint = settings.get('azure_endpoint') or settings.get('endpoint') or settings.get('api_base')
-                
-                # Azure requires api_base and api_version
-                if endpoint:
-                    litellm_kwargs['api_base'] = endpoint
-                
-                if settings.get('api_version'):
-                    litellm_kwargs['api_version'] = settings['api_version']
-            
             # Send request using LiteLLM
-            response = await acompletion(**litellm_kwargs)
+            breaker = self._breaker(provider)
+            if not breaker.allow():
+                return {
+                    'success': False,
+                    'error': f"Circuit open for provider '{provider}' after repeated failures; retry later"
+                }
+            bucket = self._rate_limiter(provider, settings)
+            try:
+                if stream:
+                    chunks = [chunk async for chunk in await _acompletion_with_retry(bucket, **litellm_kwargs, stream=True)]
+                    response = litellm.stream_chunk_builder(chunks, messages=messages)
+                else:
+                    response = await _acompletion_with_retry(bucket, **litellm_kwargs)
+            except _TRANSIENT_ERRORS:
+                breaker.record_failure()
+                raise
+            except Exception:
+                # The provider answered (auth, bad request, ...), so it is reachable
+                breaker.record_success()
+                raise
+            breaker.record_success()
             
             # Return response
-            return {
-                'success': True,
-                'id': response.id,
-                'model': response.model,
-                'choices': [
-                    {
-                        'index': choice.index,
-                        'message': {
-                            'role': choice.message.role,
-                            'content': choice.message.content
-                        },
-                        'finish_reason': choice.finish_reason
-                    }
-                    for choice in response.choices
-                ],
-                'usage': {
-                    'prompt_tokens': response.usage.prompt_tokens if response.usage else 0,
-                    'completion_tokens': response.usage.completion_tokens if response.usage else 0,
-                    'total_tokens': response.usage.total_tokens if response.usage else 0
-                }
-            }
+            result = self._marshal_response(response)
+            
+            if cacheable:
+                if cache is None:
+                    with self._response_cache_lock:
+                        self._response_cache[cache_key] = result
+                else:
+                    await asyncio.to_thread(cache.__setitem__, cache_key, result)
+                if embedding is not None:
+                    self._semantic_cache.add(scope, embedding, prompt_text, result)
+            
+            return result
         
         except Exception as e:
             return {
@@ -272,6 +531,161 @@ class LLMService:
                 'error': str(e)
             }
     
+    async def chat_completion_stream(
+        self,
+        provider: str,
+        model_name: str,
+        messages: List[Dict[str, str]],
+        settings: Dict[str, Any],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion, yielding content as it is generated
+        
+        Same arguments as chat_completion. Errors are raised to the caller
+        rather than returned as a failure dict (CircuitOpenError if the
+        provider's circuit breaker is open).
+        """
+        breaker = self._breaker(provider)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for provider '{provider}' after repeated failures")
+        try:
+            response = await _acompletion_with_retry(
+                self._rate_limiter(provider, settings),
+                model=self._build_model_string(provider, model_name, settings),
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                drop_params=True,
+                **self._credential_kwargs(provider, settings),
+                **kwargs
+            )
+            
+            # The provider can still fail mid-stream, so the outcome is only known once it ends
+            async for chunk in response:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        except _TRANSIENT_ERRORS:
+            breaker.record_failure()
+            raise
+        except (Exception, GeneratorExit, asyncio.CancelledError):
+            # Also when the caller stops reading early: the provider did not fail,
+            # and a half-open trial must not stay in flight
+            breaker.record_success()
+            raise
+        breaker.record_success()
+    
+    def _breaker(self, provider: str) -> CircuitBreaker:
+        """Circuit breaker for a provider, created on first use"""
+        key = provider.lower()
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._breakers_lock:
+                breaker = self._breakers.setdefault(key, CircuitBreaker())
+        return breaker
+    
+    def _rate_limiter(self, provider: str, settings: Dict[str, Any]) -> "AsyncTokenBucket":
+        """
+        Token bucket for a provider/API key, created on first use
+        
+        Capacity is settings['qpm'] (requests per minute) or the provider
+        default, refilled evenly over a minute. Callers passing a different
+        qpm for the same key resize the shared bucket rather than getting
+        their own, so the per-key limit holds across callers.
+        """
+        spec = _resolve_provider(provider)
+        qpm = float(settings.get('qpm') or _DEFAULT_QPM.get(spec.name, _FALLBACK_QPM))
+        key = (spec.name, _api_key_hash(settings))
+        
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._buckets_lock:
+                bucket = self._buckets.setdefault(key, AsyncTokenBucket(capacity=qpm, refill_per_sec=qpm / 60))
+        if bucket.capacity != qpm:
+            bucket.resize(capacity=qpm, refill_per_sec=qpm / 60)
+        return bucket
+    
+    @staticmethod
+    def _marshal_response(response) -> Dict[str, Any]:
+        """Plain-dict form of a LiteLLM ModelResponse"""
+        prompt_tokens, completion_tokens, total_tokens = (
+            _USAGE_GET(response.usage) if response.usage else (0, 0, 0)
+        )
+        return {
+            'success': True,
+            'id': response.id,
+            'model': response.model,
+            'choices': [
+                {
+                    'index': choice.index,
+                    'message': {'role': choice.message.role, 'content': choice.message.content},
+                    'finish_reason': choice.finish_reason
+                }
+                for choice in response.choices
+            ],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': total_tokens
+            }
+        }
+    
+    @staticmethod
+    def _embedding_kwargs(settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        LiteLLM aembedding() model and credentials, or None if not configured
+        
+        The chat provider's key is never reused: it may belong to a provider
+        that has no embedding model, or to a different service altogether.
+        """
+        kwargs = {arg: settings[key] for key, arg in _EMBEDDING_SETTINGS.items() if settings.get(key)}
+        if 'model' not in kwargs or 'api_key' not in kwargs:
+            return None
+        return kwargs
+    
+    async def _embed(self, text: str, embedding_kwargs: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Unit-length embedding of `text`, or None if it could not be computed"""
+        try:
+            response = await litellm.aembedding(input=[text], **embedding_kwargs)
+            vector = np.asarray(response.data[0]['embedding'], dtype=np.float32)
+        except Exception as e:
+            logger.warning("Embedding failed, semantic cache skipped: %s", e)
+            return None
+        
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+    
+    @staticmethod
+    def _response_cache_key(
+        provider: str,
+        model_string: str,
+        credentials: Dict[str, Any],
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        extra: Dict[str, Any]
+    ) -> str:
+        """
+        Stable hash of everything that determines a completion
+        
+        Includes the API key fingerprint and endpoint, so a cached response is
+        only served to callers of the same account and deployment.
+        """
+        payload = json.dumps(
+            {
+                'p': provider, 'm': model_string,
+                'k': _api_key_hash(credentials), 'b': credentials.get('api_base'), 'v': credentials.get('api_version'),
+                'msgs': messages, 't': temperature, 'mx': max_tokens, 'kw': extra
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.blake2b(payload.encode()).hexdigest()
+    
     async def score_idea(
         self,
         provider: str,
@@ -295,62 +709,168 @@ class LLMService:
         Returns:
             Dict with scores and feedback
         """
-        # Build prompt
-        criteria_text = "\n".join([
-            f"- {c['name']}: {c['description']} (Scale: {c['scale_min']}-{c['scale_max']})"
-            for c in rubric_criteria
-        ])
-        
-        prompt = f"""
-You are an expert evaluator. Please score the following idea based on the given criteria.
-
-Idea Title: {idea_title}
-Idea Summary: {idea_summary}
-
-Evaluation Criteria:
-{criteria_text}
-
-Please provide:
-1. A score for each criterion (within the specified scale)
-2. Brief feedback explaining each score
-3. Overall feedback and suggestions for improvement
-
-Format your response as JSON with this structure:
-{{
-    "scores": {{
-        "criterion_name": score,
-        ...
-    }},
-    "feedback": {{
-        "criterion_name": "explanation",
-        ...
-    }},
-    "overall_feedback": "overall assessment and suggestions"
-}}
-"""
+        messages = self._build_score_messages(provider, idea_title, idea_summary, rubric_criteria)
         
         # Send request
         result = await self.chat_completion(
             provider=provider,
             model_name=model_name,
-            messages=[{"role": "user", "content": prompt}],
+            messages=messages,
             settings=settings,
             temperature=0.3,  # Lower temperature for more consistent scoring
-            max_tokens=2000
+            max_tokens=2000,
+            **self._score_request_kwargs(provider, model_name, settings, rubric_criteria)
         )
         
+        return self._parse_score_result(result)
+    
+    async def score_ideas_batch(
+        self,
+        provider: str,
+        model_name: str,
+        settings: Dict[str, Any],
+        ideas: List[Dict[str, str]],
+        rubric_criteria: List[Dict[str, Any]],
+        concurrency: int = 50,
+        qpm: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Score many ideas concurrently
+        
+        Args:
+            provider: Provider name
+            model_name: Model identifier
+            settings: Provider settings (api_key, api_base, etc.)
+            ideas: List of dicts with 'idea_title' and 'idea_summary'
+            rubric_criteria: List of rubric criteria with name, description, scale
+            concurrency: Maximum requests in flight
+            qpm: Provider request-per-minute limit (overrides settings['qpm'])
+        
+        Returns:
+            List of score_idea results, in the same order as `ideas`
+        """
+        message_lists = [
+            self._build_score_messages(provider, idea['idea_title'], idea['idea_summary'], rubric_criteria)
+            for idea in ideas
+        ]
+        request_kwargs = self._score_request_kwargs(provider, model_name, settings, rubric_criteria)
+        if qpm:
+            settings = {**settings, 'qpm': qpm}
+        
+        # chat_completion applies the shared per-provider rate limit
+        sem = asyncio.Semaphore(concurrency)
+        
+        async def send(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+            async with sem:
+                return await self.chat_completion(
+                    provider=provider,
+                    model_name=model_name,
+                    messages=messages,
+                    settings=settings,
+                    temperature=0.3,
+                    max_tokens=2000,
+                    **request_kwargs
+                )
+        
+        results = await asyncio.gather(*(send(messages) for messages in message_lists), return_exceptions=True)
+        
+        return [
+            {'success': False, 'error': str(result)} if isinstance(result, Exception)
+            else self._parse_score_result(result)
+            for result in results
+        ]
+    
+    def _build_score_messages(
+        self,
+        provider: str,
+        idea_title: str,
+        idea_summary: str,
+        rubric_criteria: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Build scoring messages for one idea
+        
+        The instructions and rubric criteria go in a system message that is
+        byte-identical for every idea scored against the same rubric, so
+        provider prompt-prefix caching can reuse it; only the short idea
+        block varies.
+        """
+        system_prompt = _scoring_system_prompt(_format_criteria(_criteria_key(rubric_criteria)))
+        
+        if self._is_anthropic(provider):
+            # Claude only caches blocks explicitly marked with cache_control
+            system_message = {
+                "role": "system",
+                "content": [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+            }
+        else:
+            # OpenAI/Azure/Gemini cache long shared prefixes automatically
+            system_message = {"role": "system", "content": system_prompt}
+        
+        return [
+            system_message,
+            {"role": "user", "content": _IDEA_PROMPT.format_map({'idea_title': idea_title, 'idea_summary': idea_summary})}
+        ]
+    
+    def _prompt_cache_kwargs(self, provider: str) -> Dict[str, Any]:
+        """Extra completion kwargs that enable provider-side prompt caching"""
+        if self._is_anthropic(provider):
+            return {'extra_headers': {'anthropic-beta': 'prompt-caching-2024-07-31'}}
+        return {}
+    
+    def _score_request_kwargs(
+        self,
+        provider: str,
+        model_name: str,
+        settings: Dict[str, Any],
+        rubric_criteria: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Extra completion kwargs for scoring requests
+        
+        OpenAI/Azure models that LiteLLM knows support structured output get a
+        strict JSON schema built from the rubric; other OpenAI/Azure models
+        (older models and api_versions reject json_schema) and Gemini get JSON
+        mode; other providers rely on the prompt's JSON instructions.
+        """
+        kwargs = self._prompt_cache_kwargs(provider)
+        spec_name = _resolve_provider(provider).name
+        
+        if spec_name in ('openai', 'azure') and _supports_response_schema(
+            self._build_model_string(provider, model_name, settings)
+        ):
+            kwargs['response_format'] = {
+                'type': 'json_schema',
+                'json_schema': {
+                    'name': 'idea_score',
+                    'schema': _score_schema(_criteria_key(rubric_criteria)),
+                    'strict': True
+                }
+            }
+        elif spec_name in ('openai', 'azure', 'gemini'):
+            kwargs['response_format'] = {'type': 'json_object'}
+        
+        return kwargs
+    
+    @staticmethod
+    def _is_anthropic(provider: str) -> bool:
+        return _resolve_provider(provider).name == 'anthropic'
+    
+    def _parse_score_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn a chat_completion result into a scoring result"""
         if result['success']:
+            content = _extract_first_content(result)
             try:
-                # Extract JSON from response
-                content = result['choices'][0]['message']['content']
-                
-                # Try to parse JSON (handle markdown code blocks)
-                if '```json' in content:
-                    content = content.split('```json')[1].split('```')[0].strip()
-                elif '```' in content:
-                    content = content.split('```')[1].split('```')[0].strip()
+                # JSON mode / structured output returns the bare object
+                payload = content.strip()
+                if payload[:1] != '{':
+                    # Free-form reply: look for a ```json fenced object
+                    match = _FENCE_RE.search(content)
+                    if not match:
+                        raise ValueError("response is not a JSON object")
+                    payload = match.group(1)
                 
-                scoring_result = json.loads(content)
+                scoring_result = orjson.loads(payload)
                 
                 return {
                     'success': True,
@@ -363,11 +883,182 @@ Format your response as JSON with this structure:
                 return {
                     'success': False,
                     'error': f"Failed to parse scoring response: {str(e)}",
-                    'raw_response': result['choices'][0]['message']['content']
+                    'raw_response': content
                 }
         else:
             return result
 
 
+def _extract_first_content(result: Dict[str, Any]) -> str:
+    """Text of the first choice in a chat_completion result ('' if none)"""
+    choices = result.get('choices')
+    return (choices[0]['message']['content'] or '') if choices else ''
+
+
+def _criteria_key(rubric_criteria: List[Dict[str, Any]]) -> Tuple[Tuple[str, str, int, int], ...]:
+    """Hashable (name, description, scale_min, scale_max) form of rubric criteria"""
+    return tuple(
+        (c['name'], c['description'], c['scale_min'], c['scale_max'])
+        for c in rubric_criteria
+    )
+
+
+@lru_cache(maxsize=64)
+def _supports_response_schema(model_string: str) -> bool:
+    """Whether LiteLLM lists the model as accepting json_schema response formats"""
+    try:
+        return litellm.supports_response_schema(model=model_string)
+    except Exception:
+        # Unknown model (e.g. a custom Azure deployment name)
+        return False
+
+
+@lru_cache(maxsize=64)
+def _score_schema(criteria: Tuple[Tuple[str, str, int, int], ...]) -> Dict[str, Any]:
+    """JSON schema of a scoring response for the given rubric criteria"""
+    names = [name for name, _, _, _ in criteria]
+    
+    def per_criterion(value_schema: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'type': 'object',
+            'properties': {name: value_schema for name in names},
+            'required': names,
+            'additionalProperties': False
+        }
+    
+    return {
+        'type': 'object',
+        'properties': {
+            'scores': per_criterion({'type': 'number'}),
+            'feedback': per_criterion({'type': 'string'}),
+            'overall_feedback': {'type': 'string'}
+        },
+        'required': ['scores', 'feedback', 'overall_feedback'],
+        'additionalProperties': False
+    }
+
+
+@lru_cache(maxsize=64)
+def _format_criteria(criteria: Tuple[Tuple[str, str, int, int], ...]) -> str:
+    """Bullet list of (name, description, scale_min, scale_max) rubric criteria"""
+    return "\n".join(
+        f"- {name}: {description} (Scale: {scale_min}-{scale_max})"
+        for name, description, scale_min, scale_max in criteria
+    )
+
+
+# Scoring prompt templates; the JSON example stays out of format_map so its braces are literal
+_SCORE_INSTRUCTIONS = """
+You are an expert evaluator. Please score the idea in the next message based on the given criteria.
+
+Evaluation Criteria:
+{criteria_text}
+
+Please provide:
+1. A score for each criterion (within the specified scale)
+2. Brief feedback explaining each score
+3. Overall feedback and suggestions for improvement
+
+Format your response as JSON with this structure:
+"""
+
+_SCORE_RESPONSE_EXAMPLE = """{
+    "scores": {
+        "criterion_name": score,
+        ...
+    },
+    "feedback": {
+        "criterion_name": "explanation",
+        ...
+    },
+    "overall_feedback": "overall assessment and suggestions"
+}
+"""
+
+_IDEA_PROMPT = "Idea Title: {idea_title}\nIdea Summary: {idea_summary}"
+
+
+@lru_cache(maxsize=64)
+def _scoring_system_prompt(criteria_text: str) -> str:
+    """Static scoring instructions for a rubric (memoized so the prefix is reused verbatim)"""
+    return _SCORE_INSTRUCTIONS.format_map({'criteria_text': criteria_text}) + _SCORE_RESPONSE_EXAMPLE
+
+
+class AsyncTokenBucket:
+    """
+    Async token bucket rate limiter
+    
+    Holds up to `capacity` tokens, refilled continuously at `refill_per_sec`.
+    Each request takes one token, waiting for a refill when the bucket is empty.
+    
+    Tokens are reserved under a thread lock and the wait happens outside it,
+    so one bucket can be shared by callers on different threads and event
+    loops (API requests and pipeline runs on worker threads).
+    
+    The refill rate adapts to the provider: each rate-limit response halves
+    it (penalize) and each success restores a little of it (recover).
+    """
+    
+    # Floor for the adaptive refill rate, as a fraction of the configured rate
+    MIN_RATE_FRACTION = 1 / 16
+    # Share of the configured rate regained per successful request
+    RECOVERY_STEP = 0.05
+    
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = capacity
+        self.base_refill_per_sec = refill_per_sec
+        self.refill_per_sec = refill_per_sec
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    async def acquire(self, n: float = 1):
+        """Take `n` tokens, sleeping until they are available"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_per_sec)
+            self.last_refill = now
+            # A negative balance is a reservation against future refills
+            self.tokens -= n
+            wait = -self.tokens / self.refill_per_sec if self.tokens < 0 else 0
+        
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    def resize(self, capacity: float, refill_per_sec: float):
+        """Change the configured limit, keeping any adaptive slowdown proportionally"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_per_sec)
+            self.last_refill = now
+            
+            self.refill_per_sec = refill_per_sec * (self.refill_per_sec / self.base_refill_per_sec)
+            self.base_refill_per_sec = refill_per_sec
+            self.capacity = capacity
+            self.tokens = min(self.tokens, capacity)
+    
+    def penalize(self, retry_after: Optional[float] = None):
+        """Halve the refill rate and hold back tokens for `retry_after` seconds"""
+        with self._lock:
+            self.refill_per_sec = max(
+                self.base_refill_per_sec * self.MIN_RATE_FRACTION,
+                self.refill_per_sec / 2
+            )
+            # Drop any burst allowance; a negative balance delays the next acquire
+            self.tokens = min(self.tokens, 0)
+            if retry_after:
+                self.tokens = min(self.tokens, -retry_after * self.refill_per_sec)
+    
+    def recover(self):
+        """Step the refill rate back towards the configured rate"""
+        if self.refill_per_sec >= self.base_refill_per_sec:
+            return
+        with self._lock:
+            self.refill_per_sec = min(
+                self.base_refill_per_sec,
+                self.refill_per_sec + self.base_refill_per_sec * self.RECOVERY_STEP
+            )
+
+
 # Global instance
 llm_service = LLMService()
@@ -3,18 +3,64 @@ Model Configuration Service
 Manages LLM provider configurations
 """
 from typing import Dict, List, Any, Optional
+import asyncio
 import json
+import logging
+import random
+import secrets
+import time
 from datetime import datetime
+from functools import lru_cache
+from cachetools import TTLCache
 
-from config.database import get_db_connection
+from config.database import execute_prepared, get_db_connection, to_jsonb
 from config.redis_client import get_redis_client
 from services.llm_service import llm_service
 from models.types import Provider, ConfigStatus
 
+logger = logging.getLogger(__name__)
+
 
 class ModelConfigService:
     CACHE_KEY = "active_model_config"
     CACHE_TTL = 300  # 5 minutes
+    CACHE_TTL_JITTER = 0.15  # +/-15% so entries written together don't expire together
+    
+    # Single-flight lock so only one caller reloads the active config on a cache miss
+    LOCK_KEY = "active_model_config:lock"
+    LOCK_TTL_MS = 5000
+    LOCK_POLL_INTERVAL = 0.05
+    # Delete the lock only if we still own it
+    RELEASE_LOCK_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+    
+    # Published on activate/deactivate so every process drops its local copy
+    INVALIDATE_CHANNEL = "model_config:invalidate"
+    # Message prefix on INVALIDATE_CHANNEL that only evicts one config from the id cache
+    ID_INVALIDATION_PREFIX = "id:"
+    LOCAL_CACHE_TTL = 5  # seconds; bounds staleness if an invalidation is missed
+    
+    # History requests above this many rows are streamed through a server-side cursor
+    HISTORY_FETCH_SIZE = 50
+    
+    ID_CACHE_SIZE = 64
+    ID_CACHE_TTL = 30  # seconds; bounds staleness after a write in another process
+    
+    ACTIVE_UPDATE_ERROR = 'Cannot update active configuration. Deactivate it first or create a new version.'
+    
+    def __init__(self):
+        # In-process copy of the active config in front of Redis
+        self._local_cache = TTLCache(maxsize=1, ttl=self.LOCAL_CACHE_TTL)
+        self._local_generation = 0
+        self._listener_task: Optional[asyncio.Task] = None
+        # Recently read configs by id, with one in-flight fetch per id
+        self._id_cache = TTLCache(maxsize=self.ID_CACHE_SIZE, ttl=self.ID_CACHE_TTL)
+        # id -> [lock, number of callers holding or waiting for it]
+        self._id_locks: Dict[str, list] = {}
     
     async def create_config(
         self,
@@ -25,10 +71,17 @@ class ModelConfigService:
         notes: Optional[str] = None
     ) -> Dict[str, Any]:
         """Create a new model configuration"""
-        
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
+        return await asyncio.to_thread(self._insert_config, provider, name, settings, created_by, notes)
+    
+    def _insert_config(
+        self,
+        provider: str,
+        name: str,
+        settings: Dict[str, Any],
+        created_by: str,
+        notes: Optional[str]
+    ) -> Dict[str, Any]:
+        with get_db_connection() as conn, conn, conn.cursor() as cursor:
             cursor.execute("""
                 INSERT INTO model_provider_configs (provider, name, settings, status, notes, created_by)
                 VALUES (%s, %s, %s, %s, %s, %s)
@@ -36,21 +89,33 @@ class ModelConfigService:
             """, (
                 provider,
                 name,
-                json.dumps(settings),
+                to_jsonb(settings),
                 'draft',
                 notes,
                 created_by
             ))
             
             row = cursor.fetchone()
-            conn.commit()
-            cursor.close()
             
             return self._map_row_to_config(row, cursor.description)
     
     async def get_active_config(self) -> Optional[Dict[str, Any]]:
         """Get the currently active configuration"""
         
+        config = self._local_cache.get(self.CACHE_KEY)
+        if config is not None:
+            return config
+        
+        # Don't store a result that an invalidation overtook while we were loading it
+        generation = self._local_generation
+        config = await self._get_shared_active_config()
+        if config is not None and generation == self._local_generation:
+            self._local_cache[self.CACHE_KEY] = config
+        return config
+    
+    async def _get_shared_active_config(self) -> Optional[Dict[str, Any]]:
+        """Active config from Redis, or from the database on a cache miss"""
+        
         # Try cache first
         try:
             redis = await get_redis_client()
@@ -58,12 +123,67 @@ class ModelConfigService:
             if cached:
                 return json.loads(cached)
         except:
-            pass  # Redis not available, continue to database
+            # Redis not available, continue to database
+            return await asyncio.to_thread(self._fetch_active_config)
         
-        # Query database
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
+        # Cache miss: let one caller reload it while the rest wait for the cache
+        token = secrets.token_hex(8)
+        try:
+            acquired = await redis.set(self.LOCK_KEY, token, nx=True, px=self.LOCK_TTL_MS)
+        except:
+            acquired = False
+        
+        if not acquired:
+            cached = await self._wait_for_cached_config(redis)
+            if cached is not None:
+                return cached
+            # Loader found nothing to cache (or gave up); query ourselves
+            return await self._load_active_config(redis)
+        
+        try:
+            # Another caller may have filled the cache before we got the lock
+            cached = await redis.get(self.CACHE_KEY)
+            if cached:
+                return json.loads(cached)
+            return await self._load_active_config(redis)
+        finally:
+            try:
+                await redis.eval(self.RELEASE_LOCK_SCRIPT, 1, self.LOCK_KEY, token)
+            except:
+                pass  # Lock expires on its own
+    
+    async def _wait_for_cached_config(self, redis) -> Optional[Dict[str, Any]]:
+        """Poll the cache while another caller holds the reload lock"""
+        deadline = time.monotonic() + self.LOCK_TTL_MS / 1000
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.LOCK_POLL_INTERVAL)
+                cached = await redis.get(self.CACHE_KEY)
+                if cached:
+                    return json.loads(cached)
+                if not await redis.exists(self.LOCK_KEY):
+                    break
+        except:
+            pass
+        return None
+    
+    async def _load_active_config(self, redis) -> Optional[Dict[str, Any]]:
+        """Query the active config and write it to the cache"""
+        config = await asyncio.to_thread(self._fetch_active_config)
+        if config is None:
+            return None
+        
+        # Cache the result
+        try:
+            ttl = int(self.CACHE_TTL * (1 + random.uniform(-self.CACHE_TTL_JITTER, self.CACHE_TTL_JITTER)))
+            await redis.setex(self.CACHE_KEY, ttl, json.dumps(config, default=str))
+        except:
+            pass  # Redis not available
+        
+        return config
+    
+    def _fetch_active_config(self) -> Optional[Dict[str, Any]]:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM model_provider_configs
                 WHERE is_active = true
@@ -72,27 +192,23 @@ class ModelConfigService:
             
             row = cursor.fetchone()
             description = cursor.description
-            cursor.close()
             
             if not row:
                 return None
             
-            config = self._map_row_to_config(row, description)
-            
-            # Cache the result
-            try:
-                redis = await get_redis_client()
-                await redis.setex(self.CACHE_KEY, self.CACHE_TTL, json.dumps(config, default=str))
-            except:
-                pass  # Redis not available
-            
-            return config
+            return self._map_row_to_config(row, description)
     
     async def get_config_history(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get configuration history"""
+        return await asyncio.to_thread(self._fetch_config_history, limit)
+    
+    def _fetch_config_history(self, limit: int) -> List[Dict[str, Any]]:
+        # Small pages come back in one round-trip; large ones are fetched in chunks
+        cursor_name = 'config_history' if limit > self.HISTORY_FETCH_SIZE else None
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
+        with get_db_connection() as conn, conn, conn.cursor(name=cursor_name) as cursor:
+            if cursor_name:
+                cursor.itersize = self.HISTORY_FETCH_SIZE
             
             cursor.execute("""
                 SELECT * FROM model_provider_configs
@@ -100,18 +216,37 @@ class ModelConfigService:
                 LIMIT %s
             """, (limit,))
             
-            rows = cursor.fetchall()
-            description = cursor.description
-            cursor.close()
-            
-            return [self._map_row_to_config(row, description) for row in rows]
+            return self._map_rows_to_configs(cursor)
     
     async def get_config_by_id(self, config_id: str) -> Optional[Dict[str, Any]]:
         """Get configuration by ID"""
+        key = str(config_id)
+        config = self._id_cache.get(key)
+        if config is not None:
+            return config
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
+        # Single-flight: concurrent misses for the same id share one query.
+        # The lock is dropped only once no caller holds or waits for it.
+        entry = self._id_locks.get(key)
+        if entry is None:
+            entry = self._id_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                config = self._id_cache.get(key)
+                if config is None:
+                    config = await asyncio.to_thread(self._fetch_config_by_id, config_id)
+                    if config is not None:
+                        self._id_cache[key] = config
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._id_locks[key]
+        
+        return config
+    
+    def _fetch_config_by_id(self, config_id: str) -> Optional[Dict[str, Any]]:
+        with get_db_connection() as conn, conn.cursor() as cursor:
             cursor.execute("""
                 SELECT * FROM model_provider_configs
                 WHERE id = %s
@@ -119,7 +254,6 @@ class ModelConfigService:
             
             row = cursor.fetchone()
             description = cursor.description
-            cursor.close()
             
             if not row:
                 return None
@@ -128,10 +262,13 @@ class ModelConfigService:
     
     async def update_config_status(self, config_id: str, status: str) -> Dict[str, Any]:
         """Update configuration status"""
-        
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
+        try:
+            return await asyncio.to_thread(self._write_config_status, config_id, status)
+        finally:
+            await self._invalidate_config_id(config_id)
+    
+    def _write_config_status(self, config_id: str, status: str) -> Dict[str, Any]:
+        with get_db_connection() as conn, conn, conn.cursor() as cursor:
             cursor.execute("""
                 UPDATE model_provider_configs
                 SET status = %s, updated_at = NOW()
@@ -141,13 +278,11 @@ class ModelConfigService:
             
             row = cursor.fetchone()
             description = cursor.description
-            conn.commit()
-            cursor.close()
             
             if not row:
                 raise ValueError('Configuration not found')
             
-            print(f"Updated config {config_id} status to: {status}")
+            logger.info("Updated config %s status to: %s", config_id, status)
             
             return self._map_row_to_config(row, description)
     
@@ -157,145 +292,108 @@ class ModelConfigService:
         if purpose not in ['evaluation', 'verification']:
             raise ValueError('Purpose must be either "evaluation" or "verification"')
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
+        config = await asyncio.to_thread(self._activate_config_tx, config_id, purpose)
+        await self._invalidate_cache(config_id)
+        return config
+    
+    # Locks the target config and deactivates the purpose's current one. Must
+    # finish before ACTIVATE_CONFIG_SQL runs: the one-active-per-purpose unique
+    # index is checked row by row, and data-modifying CTEs in a single statement
+    # run in no guaranteed order against the same snapshot.
+    DEACTIVATE_CURRENT_SQL = """
+        WITH chk AS (
+            SELECT id, name, status, is_active, purpose
+            FROM model_provider_configs
+            WHERE id = %(config_id)s
+            FOR UPDATE
+        ),
+        deact AS (
+            UPDATE model_provider_configs
+            SET is_active = false, status = 'inactive', updated_at = NOW()
+            WHERE is_active = true AND purpose = %(purpose)s AND id <> %(config_id)s
+              AND EXISTS (SELECT 1 FROM chk WHERE status IN ('tested', 'inactive'))
+            RETURNING 1
+        )
+        SELECT chk.name, chk.status, chk.is_active, chk.purpose,
+               (SELECT count(*) FROM deact) AS deactivated_count
+        FROM chk
+    """
+    
+    ACTIVATE_CONFIG_SQL = """
+        UPDATE model_provider_configs
+        SET is_active = true, status = 'active', purpose = %(purpose)s, updated_at = NOW()
+        WHERE id = %(config_id)s
+        RETURNING *
+    """
+    
+    def _activate_config_tx(self, config_id: str, purpose: str) -> Dict[str, Any]:
+        # Status check + deactivation, then activation, in one transaction
+        params = {'config_id': config_id, 'purpose': purpose}
+        with get_db_connection() as conn, conn, conn.cursor() as cursor:
+            cursor.execute(self.DEACTIVATE_CURRENT_SQL, params)
+            row = cursor.fetchone()
             
-            try:
-                cursor.execute("BEGIN")
-                
-                # First check if the config exists and its current status
-                cursor.execute("""
-                    SELECT id, name, status, is_active, purpose
-                    FROM model_provider_configs
-                    WHERE id = %s
-                """, (config_id,))
-                
-                check_row = cursor.fetchone()
-                if not check_row:
-                    raise ValueError(f'Configuration {config_id} not found')
-                
-                config_name, config_status, config_is_active, config_purpose = check_row[1], check_row[2], check_row[3], check_row[4]
-                print(f"Config to activate: {config_name}, status={config_status}, is_active={config_is_active}, purpose={config_purpose}")
-                
-                if config_status not in ['tested', 'inactive']:
-                    raise ValueError(f'Configuration must be in "tested" or "inactive" state to activate (current: {config_status})')
-                
-                # Deactivate current active config for this purpose
-                cursor.execute("""
-                    UPDATE model_provider_configs
-                    SET is_active = false, status = 'inactive', updated_at = NOW()
-                    WHERE is_active = true AND purpose = %s
-                """, (purpose,))
-                
-                deactivated_count = cursor.rowcount
-                print(f"Deactivated {deactivated_count} config(s) for purpose: {purpose}")
-                
-                # Activate new config with purpose
-                cursor.execute("""
-                    UPDATE model_provider_configs
-                    SET is_active = true, status = 'active', purpose = %s, updated_at = NOW()
-                    WHERE id = %s
-                    RETURNING *
-                """, (purpose, config_id))
-                
-                row = cursor.fetchone()
-                
-                if not row:
-                    raise ValueError('Failed to activate configuration')
-                
-                # Capture description before commit
-                description = cursor.description
-                
-                cursor.execute("COMMIT")
-                print(f"Successfully activated config {config_id} for purpose: {purpose}")
-                
-                # Invalidate cache
-                try:
-                    redis = await get_redis_client()
-                    await redis.delete(self.CACHE_KEY)
-                except:
-                    pass
-                
-                config = self._map_row_to_config(row, description)
-                cursor.close()
-                
-                return config
-                
-            except Exception as e:
-                print(f"Error in activate_config: {e}")
-                cursor.execute("ROLLBACK")
-                cursor.close()
-                raise e
+            if not row:
+                logger.warning("Cannot activate config %s: not found", config_id)
+                raise ValueError(f'Configuration {config_id} not found')
+            
+            config_name, config_status, config_is_active, config_purpose, deactivated_count = row
+            logger.debug(
+                "Config to activate: %s, status=%s, is_active=%s, purpose=%s",
+                config_name, config_status, config_is_active, config_purpose
+            )
+            
+            if config_status not in ('tested', 'inactive'):
+                logger.warning("Cannot activate config %s: status is %s", config_id, config_status)
+                raise ValueError(f'Configuration must be in "tested" or "inactive" state to activate (current: {config_status})')
+            
+            logger.debug("Deactivated %d config(s) for purpose: %s", deactivated_count, purpose)
+            
+            # Row is locked by DEACTIVATE_CURRENT_SQL, so the status checked above still holds
+            cursor.execute(self.ACTIVATE_CONFIG_SQL, params)
+            row = cursor.fetchone()
+            
+            logger.info("Activated config %s for purpose: %s", config_id, purpose)
+            
+            return self._map_row_to_config(row, cursor.description)
     
     async def deactivate_config(self, config_id: str) -> Dict[str, Any]:
         """Deactivate a configuration"""
-        
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
+        config = await asyncio.to_thread(self._deactivate_config_tx, config_id)
+        await self._invalidate_cache(config_id)
+        return config
+    
+    def _deactivate_config_tx(self, config_id: str) -> Dict[str, Any]:
+        with get_db_connection() as conn, conn, conn.cursor() as cursor:
+            # Deactivate the config
+            cursor.execute("""
+                UPDATE model_provider_configs
+                SET is_active = false, status = 'tested', updated_at = NOW()
+                WHERE id = %s AND is_active = true
+                RETURNING *
+            """, (config_id,))
             
-            try:
-                cursor.execute("BEGIN")
-                
-                # Deactivate the config
-                cursor.execute("""
-                    UPDATE model_provider_configs
-                    SET is_active = false, status = 'tested', updated_at = NOW()
-                    WHERE id = %s AND is_active = true
-                    RETURNING *
-                """, (config_id,))
-                
-                row = cursor.fetchone()
-                
-                if not row:
-                    raise ValueError('Configuration not found or not currently active')
-                
-                # Capture description before commit
-                description = cursor.description
-                
-                cursor.execute("COMMIT")
-                
-                # Invalidate cache
-                try:
-                    redis = await get_redis_client()
-                    await redis.delete(self.CACHE_KEY)
-                except:
-                    pass
-                
-                config = self._map_row_to_config(row, description)
-                cursor.close()
-                
-                return config
-                
-            except Exception as e:
-                cursor.execute("ROLLBACK")
-                cursor.close()
-                raise e
+            row = cursor.fetchone()
+            
+            if not row:
+                raise ValueError('Configuration not found or not currently active')
+            
+            return self._map_row_to_config(row, cursor.description)
     
-    async def test_connection(self, config_id: str) -> Dict[str, Any]:
-        """Test a configuration"""
-        
-        print(f"ModelConfigService.test_connection called with config_id: {config_id}")
+    async def test_connection(self, config_id: str, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Test a configuration (pass `config` when the caller already has it)"""
         
-        config = await self.get_config_by_id(config_id)
-        
-        print(f"Retrieved config: {config}")
+        if config is None:
+            # Read through: a cached copy may predate an edit made in another process,
+            # and the result below marks the stored settings as tested
+            config = await asyncio.to_thread(self._fetch_config_by_id, config_id)
         
         if not config:
             raise ValueError(f'Configuration not found for id: {config_id}')
         
-        # Extract model name
-        model_name = config['settings'].get('model_name') or config['settings'].get('deployment_name') or config['settings'].get('model', '')
+        model_name = self._resolve_settings(config.get('settings'))['model_name']
         
-        # Extract Azure endpoint (try multiple field names)
-        azure_endpoint = (
-            config['settings'].get('azure_endpoint') or 
-            config['settings'].get('endpoint') or 
-            config['settings'].get('azure_endpoint_url') or
-            config['settings'].get('api_base')  # Fallback to api_base for Azure
-        )
-        
-        print(f"Testing with provider: {config['provider']}, model: {model_name}")
-        print(f"Settings: {config['settings']}")
+        logger.debug("Testing config %s with provider: %s, model: %s", config_id, config['provider'], model_name)
         
         # Test using LLM service (now using LiteLLM)
         result = await llm_service.test_model(
@@ -304,7 +402,7 @@ class ModelConfigService:
             settings=config['settings']
         )
         
-        print(f"LLM test result: {result}")
+        logger.debug("LLM test result for config %s: %s", config_id, result)
         
         # Update status if successful
         if result['success']:
@@ -321,89 +419,178 @@ class ModelConfigService:
     ) -> Dict[str, Any]:
         """Update a configuration"""
         
-        config = await self.get_config_by_id(config_id)
-        
-        if not config:
-            raise ValueError('Configuration not found')
-        
-        if config['is_active']:
-            raise ValueError('Cannot update active configuration. Deactivate it first or create a new version.')
-        
-        # Build update query
-        updates = []
-        values = []
+        # Build update values
+        fields = {}
         
         if name is not None:
-            updates.append("name = %s")
-            values.append(name)
+            fields['name'] = name
         
         if settings is not None:
-            # Merge with existing settings
-            merged_settings = {**config['settings'], **settings}
-            updates.append("settings = %s")
-            values.append(json.dumps(merged_settings))
-            # Reset status to draft if settings changed
-            updates.append("status = %s")
-            values.append('draft')
+            # Merged into the stored settings by the statement, which also resets status to draft
+            fields['settings'] = to_jsonb(settings)
         
         if notes is not None:
-            updates.append("notes = %s")
-            values.append(notes)
+            fields['notes'] = notes
         
-        if not updates:
-            return config  # No changes
+        if not fields:
+            # No changes
+            config = await self.get_config_by_id(config_id)
+            if not config:
+                raise ValueError('Configuration not found')
+            if config['is_active']:
+                raise ValueError(self.ACTIVE_UPDATE_ERROR)
+            return config
         
-        updates.append("updated_at = NOW()")
-        values.append(config_id)
+        try:
+            return await asyncio.to_thread(self._write_config_updates, config_id, fields)
+        finally:
+            await self._invalidate_config_id(config_id)
+    
+    def _write_config_updates(self, config_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        # One prepared statement per combination of updated fields
+        mask = sum(1 << i for i, field in enumerate(UPDATABLE_FIELDS) if field in fields)
+        params = tuple(fields[field] for field in UPDATABLE_FIELDS if field in fields) + (config_id,)
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            query = f"""
-                UPDATE model_provider_configs
-                SET {', '.join(updates)}
-                WHERE id = %s
-                RETURNING *
-            """
-            
-            cursor.execute(query, values)
+        with get_db_connection() as conn, conn, conn.cursor() as cursor:
+            execute_prepared(cursor, f'update_config_{mask}', _update_config_sql(mask), params)
             row = cursor.fetchone()
-            conn.commit()
-            cursor.close()
             
             if not row:
-                raise ValueError('Configuration not found')
+                # Only inactive configs match; look up which check failed for the error message
+                cursor.execute("SELECT is_active FROM model_provider_configs WHERE id = %s", (config_id,))
+                existing = cursor.fetchone()
+                if not existing:
+                    raise ValueError('Configuration not found')
+                raise ValueError(self.ACTIVE_UPDATE_ERROR)
             
             return self._map_row_to_config(row, cursor.description)
     
     async def delete_config(self, config_id: str) -> bool:
         """Delete a configuration"""
-        
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
+        try:
+            return await asyncio.to_thread(self._delete_config_row, config_id)
+        finally:
+            await self._invalidate_config_id(config_id)
+    
+    def _delete_config_row(self, config_id: str) -> bool:
+        with get_db_connection() as conn, conn, conn.cursor() as cursor:
             cursor.execute("""
                 DELETE FROM model_provider_configs
                 WHERE id = %s AND is_active = false
             """, (config_id,))
             
             deleted = cursor.rowcount > 0
-            conn.commit()
-            cursor.close()
             
             if not deleted:
                 raise ValueError('Configuration not found or is currently active')
             
             return True
     
+    async def _invalidate_cache(self, config_id: str):
+        """Drop the cached active config here, in Redis, and in every other process"""
+        self._clear_local_cache()
+        try:
+            redis = await get_redis_client()
+            # One round-trip for the delete and the broadcast
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.delete(self.CACHE_KEY)
+                pipe.publish(self.INVALIDATE_CHANNEL, str(config_id))
+                await pipe.execute()
+        except:
+            pass
+    
+    async def _invalidate_config_id(self, config_id: str):
+        """Drop one config from the id cache here and in every other process"""
+        self._id_cache.pop(str(config_id), None)
+        try:
+            redis = await get_redis_client()
+            await redis.publish(self.INVALIDATE_CHANNEL, f"{self.ID_INVALIDATION_PREFIX}{config_id}")
+        except Exception as e:
+            logger.warning("Could not broadcast invalidation of config %s: %s", config_id, e)
+    
+    def _clear_local_cache(self):
+        self._local_generation += 1
+        self._local_cache.clear()
+        # Activation also changes the previously active config, so drop every cached id
+        self._id_cache.clear()
+    
+    async def start_invalidation_listener(self):
+        """Start the background task that applies invalidations from other processes"""
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen_for_invalidations())
+    
+    async def stop_invalidation_listener(self):
+        """Stop the invalidation listener task"""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+    
+    async def _listen_for_invalidations(self):
+        while True:
+            try:
+                redis = await get_redis_client()
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(self.INVALIDATE_CHANNEL)
+                try:
+                    async for message in pubsub.listen():
+                        if message.get('type') != 'message':
+                            continue
+                        data = message.get('data') or ''
+                        if data.startswith(self.ID_INVALIDATION_PREFIX):
+                            self._id_cache.pop(data[len(self.ID_INVALIDATION_PREFIX):], None)
+                        else:
+                            self._clear_local_cache()
+                finally:
+                    await pubsub.reset()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Config invalidation listener error (retrying in 5s): %s", e)
+                # We may have missed messages while disconnected
+                self._clear_local_cache()
+                await asyncio.sleep(5)
+    
+    @staticmethod
+    def _resolve_settings(settings: Any) -> Dict[str, Any]:
+        """Model name and endpoint coalesced from the aliases settings may use"""
+        if not isinstance(settings, dict):
+            settings = {}
+        
+        return {
+            'model_name': settings.get('model_name') or settings.get('deployment_name') or settings.get('model', ''),
+            'endpoint': (
+                settings.get('azure_endpoint') or
+                settings.get('endpoint') or
+                settings.get('azure_endpoint_url') or
+                settings.get('api_base')
+            )
+        }
+    
+    def _map_rows_to_configs(self, cursor) -> List[Dict[str, Any]]:
+        """Map all remaining cursor rows to config dicts"""
+        rows = iter(cursor)
+        first = next(rows, None)
+        if first is None:
+            return []
+        
+        # Column names once per result (a named cursor only has a description after fetching)
+        columns = [desc[0] for desc in cursor.description]
+        configs = [self._row_to_config(columns, first)]
+        configs.extend(self._row_to_config(columns, row) for row in rows)
+        return configs
+    
     def _map_row_to_config(self, row: tuple, description) -> Dict[str, Any]:
         """Map database row to config dict"""
-        columns = [desc[0] for desc in description]
+        return self._row_to_config([desc[0] for desc in description], row)
+    
+    def _row_to_config(self, columns: List[str], row: tuple) -> Dict[str, Any]:
         config = dict(zip(columns, row))
         
-        # Parse JSON settings if it's a string
-        if isinstance(config.get('settings'), str):
-            config['settings'] = json.loads(config['settings'])
+        # settings is JSONB, which psycopg2 already decodes to a dict
         
         # Convert datetime to ISO string
         if config.get('created_at'):
@@ -414,5 +601,27 @@ class ModelConfigService:
         return config
 
 
+# Columns update_config can change, in bitmap order
+UPDATABLE_FIELDS = ('name', 'settings', 'notes')
+
+
+@lru_cache(maxsize=None)
+def _update_config_sql(mask: int) -> str:
+    """UPDATE statement for the fields set in `mask` ($1.. in UPDATABLE_FIELDS order, id last)"""
+    assignments = []
+    for field in (f for i, f in enumerate(UPDATABLE_FIELDS) if mask & (1 << i)):
+        assignments.append(f"{field} = ${len(assignments) + 1}")
+        if field == 'settings':
+            # Changed settings need to be tested again
+            assignments[-1] = f"settings = settings || ${len(assignments)}::jsonb, status = 'draft'"
+    
+    return f"""
+        UPDATE model_provider_configs
+        SET {', '.join(assignments)}, updated_at = NOW()
+        WHERE id = ${len(assignments) + 1} AND is_active = false
+        RETURNING *
+    """
+
+
 # Global instance
 model_config_service = ModelConfigService()
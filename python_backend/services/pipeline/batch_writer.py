@@ -0,0 +1,90 @@
+"""
+Batch Writer - Buffers per-idea database writes from pipeline workers
+"""
+from typing import Any, Callable, List, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """
+    Collect items from worker threads and write them in batches
+    
+    Items are flushed by a background thread every `interval` seconds, as
+    soon as `max_batch` items are waiting, and once more on exit. Use as a
+    context manager around the worker pool. Items of batches that could not
+    be written are kept in `unwritten` so the caller can account for them.
+    """
+    
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Any]], None],
+        max_batch: int = 64,
+        interval: float = 2.0,
+        name: str = "batch-writer",
+        on_written: Optional[Callable[[List[Any]], None]] = None
+    ):
+        """
+        Args:
+            flush_fn: Writes a list of buffered items (called from one thread at a time)
+            max_batch: Buffered items that trigger an early flush
+            interval: Seconds between background flushes
+            name: Name of the background thread (shown in logs)
+            on_written: Called with each batch once flush_fn has written it
+        """
+        self.flush_fn = flush_fn
+        self.on_written = on_written
+        self.max_batch = max_batch
+        self.interval = interval
+        self.name = name
+        self._items: List[Any] = []
+        self.unwritten: List[Any] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def add(self, item: Any):
+        """Queue an item for the next flush"""
+        with self._lock:
+            self._items.append(item)
+            full = len(self._items) >= self.max_batch
+        if full:
+            self._wake.set()
+    
+    def flush(self):
+        """Write everything queued so far"""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch, self._items = self._items[:self.max_batch], self._items[self.max_batch:]
+                if not batch:
+                    return
+                try:
+                    self.flush_fn(batch)
+                except Exception as e:
+                    logger.error("%s: failed to write %d item(s): %s", self.name, len(batch), e)
+                    self.unwritten.extend(batch)
+                    continue
+                if self.on_written:
+                    self.on_written(batch)
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+    
+    def __enter__(self) -> "BatchWriter":
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join()
+        self.flush()
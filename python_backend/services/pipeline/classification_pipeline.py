@@ -1,12 +1,14 @@
 """
 Classification Pipeline - Classifies ideas into themes and industries
 """
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Iterable, Optional, Callable
+import asyncio
 import logging
-import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from services.classification.tcs_classifier import TCSClassifier
 from services.database.db_manager import DatabaseManager
+from .batch_writer import BatchWriter
+from .stage_cache import StageCache
+from .task_window import run_windowed
 
 logger = logging.getLogger(__name__)
 
@@ -31,10 +33,13 @@ class ClassificationPipeline:
             model_settings: Model configuration settings
         """
         self.db_manager = db_manager
+        # Persistent so re-runs over unchanged ideas skip the LLM call
+        self.cache = StageCache('classification')
         self.classifier = TCSClassifier(
             provider=provider, 
             model_name=model_name,
-            model_settings=model_settings
+            model_settings=model_settings,
+            response_cache=self.cache
         )
     
     def run(
@@ -52,87 +57,139 @@ class ClassificationPipeline:
         Returns:
             Statistics dictionary
         """
-        logger.info("Starting classification pipeline")
-        
-        # Get ideas needing classification
-        ideas = self.db_manager.get_ideas_for_classification()
-        total = len(ideas)
+        return asyncio.run(self.arun(batch_size, progress_callback))
+    
+    def close(self):
+        """Release the persistent response cache"""
+        self.cache.close()
+    
+    async def arun(
+        self,
+        batch_size: int = 8,
+        progress_callback: Optional[Callable] = None,
+        ideas: Optional[Iterable[Dict[str, Any]]] = None,
+        total: Optional[int] = None,
+        on_classified: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, int]:
+        """
+        Async implementation of run(); at most `batch_size` LLM calls in flight
         
-        if total == 0:
-            logger.info("No ideas need classification")
-            return {'processed': 0, 'succeeded': 0, 'failed': 0}
+        Args:
+            ideas: Ideas to classify instead of the pending ones in the database;
+                may block while an upstream stage produces them
+            total: Expected number of ideas, for progress reporting with `ideas`
+            on_classified: Called with each classified idea, merged with its
+                classification, once its result has been written
+        """
+        logger.info("Starting classification pipeline")
         
-        logger.info(f"Found {total} ideas for classification")
+        if ideas is None:
+            # Get ideas needing classification
+            total = self.db_manager.count_ideas_for_classification()
+            
+            if total == 0:
+                logger.info("No ideas need classification")
+                return {'processed': 0, 'succeeded': 0, 'failed': 0}
+            
+            logger.info(f"Found {total} ideas for classification")
+            
+            # Ideas are streamed from the database in keyset-paginated chunks
+            ideas = self.db_manager.iter_ideas_for_classification()
         
         succeeded = 0
         failed = 0
         
+        # Ideas waiting for their result to be written before being handed on
+        awaiting_write: Dict[str, Dict[str, Any]] = {}
+        
+        def hand_on(batch):
+            for idea_id, classification in batch:
+                on_classified({**awaiting_write.pop(idea_id), **classification})
+        
+        # Results and failures are written in batches rather than one UPDATE per idea
+        self._results = BatchWriter(
+            self.db_manager.update_classifications_batch,
+            name='classification-results',
+            on_written=hand_on if on_classified else None
+        )
+        self._failures = BatchWriter(
+            lambda ids: self.db_manager.mark_failed(ids, 'classification_status'),
+            name='classification-failures'
+        )
+        
         # Process in batches
-        with ThreadPoolExecutor(max_workers=batch_size) as executor:
-            futures = {
-                executor.submit(self._classify_idea, idea): idea
-                for idea in ideas
-            }
-            
-            for i, future in enumerate(as_completed(futures), 1):
-                idea = futures[future]
+        sem = asyncio.Semaphore(batch_size)
+        
+        async def classify(idea: Dict[str, Any]) -> Dict[str, Any]:
+            idea_id = str(idea['id'])
+            if on_classified:
+                awaiting_write[idea_id] = idea
+            async with sem:
                 try:
-                    result = future.result()
-                    if result['success']:
-                        succeeded += 1
-                    else:
-                        failed += 1
+                    result = await self._classify_idea(idea)
                 except Exception as e:
                     logger.error(f"Classification failed for idea {idea.get('id')}: {e}")
+                    result = {'success': False, 'error': str(e)}
+            
+            if not result['success']:
+                awaiting_write.pop(idea_id, None)
+            return result
+        
+        with self._results, self._failures:
+            # Keep a bounded window of tasks in flight instead of one task per idea up front
+            i = 0
+            
+            async for result in run_windowed(ideas, classify, 2 * batch_size):
+                i += 1
+                if result['success']:
+                    succeeded += 1
+                else:
                     failed += 1
                 
                 # Update progress
                 if progress_callback:
-                    progress = int((i / total) * 100)
-                    progress_callback(progress, f'Classified {i}/{total} ideas')
+                    if total:
+                        progress = min(int((i / total) * 100), 100)
+                        progress_callback(progress, f'Classified {i}/{total} ideas')
+                    else:
+                        progress_callback(0, f'Classified {i} ideas')
+        
+        # Results that never reached the database did not succeed
+        lost_results = len(self._results.unwritten)
+        succeeded -= lost_results
+        failed += lost_results
+        write_errors = lost_results + len(self._failures.unwritten)
+        if write_errors:
+            logger.error(f"Classification: {write_errors} result(s) could not be written")
         
         logger.info(f"Classification complete: {succeeded} succeeded, {failed} failed")
         
         return {
-            'processed': total,
+            'processed': succeeded + failed,
             'succeeded': succeeded,
-            'failed': failed
+            'failed': failed,
+            'write_errors': write_errors,
+            **self.cache.stats()
         }
     
-    def _classify_idea(self, idea: Dict[str, Any]) -> Dict[str, Any]:
-        """Classify a single idea with retry logic for rate limits"""
+    async def _classify_idea(self, idea: Dict[str, Any]) -> Dict[str, Any]:
+        """Classify a single idea (rate-limit retries happen in the LLM service)"""
         idea_id = str(idea['id'])
-        max_retries = 3
         
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"Classifying idea {idea_id} (attempt {attempt + 1}/{max_retries})")
-                
-                # Classify the idea
-                classification = self.classifier.classify_idea(idea)
-                
-                # Update database
-                self.db_manager.update_classification(idea_id, classification)
-                
-                logger.info(f"Classification succeeded for idea {idea_id}: {classification['primary_theme']}")
-                return {'success': True}
-                
-            except Exception as e:
-                error_str = str(e)
-                
-                # Check if it's a rate limit error (429)
-                if '429' in error_str or 'quota' in error_str.lower() or 'rate limit' in error_str.lower():
-                    if attempt < max_retries - 1:
-                        # Wait before retrying (exponential backoff)
-                        wait_time = (attempt + 1) * 5  # 5, 10, 15 seconds
-                        logger.warning(f"Rate limit hit for idea {idea_id}, waiting {wait_time}s before retry...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        logger.error(f"Rate limit exceeded for idea {idea_id} after {max_retries} attempts")
-                else:
-                    logger.error(f"Classification error for idea {idea_id}: {e}")
-                
-                # Mark as failed
-                self.db_manager.update_status(idea_id, 'classification_status', 'failed')
-                return {'success': False, 'error': error_str}
+        try:
+            logger.info(f"Classifying idea {idea_id}")
+            
+            # Classify the idea
+            classification = await self.classifier.aclassify_idea(idea)
+            
+            # Queue database update
+            self._results.add((idea_id, classification))
+            
+            logger.info(f"Classification succeeded for idea {idea_id}: {classification['primary_theme']}")
+            return {'success': True, 'classification': classification}
+            
+        except Exception as e:
+            logger.error(f"Classification error for idea {idea_id}: {e}")
+            # Mark as failed
+            self._failures.add(idea_id)
+            return {'success': False, 'error': str(e)}
@@ -1,11 +1,14 @@
 """
 Evaluation Pipeline - Evaluates ideas using custom rubrics
 """
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Iterable, Optional, Callable
+import asyncio
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from services.evaluation.idea_evaluator import IdeaEvaluator
 from services.database.db_manager import DatabaseManager
+from .batch_writer import BatchWriter
+from .stage_cache import StageCache
+from .task_window import run_windowed
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +36,9 @@ class EvaluationPipeline:
         self.provider = provider
         self.model_name = model_name
         self.model_settings = model_settings or {}
+        
+        # Persistent so re-runs over unchanged ideas skip the LLM call
+        self.cache = StageCache('evaluation')
     
     def run(
         self,
@@ -49,6 +55,27 @@ class EvaluationPipeline:
         Returns:
             Statistics dictionary
         """
+        return asyncio.run(self.arun(batch_size, progress_callback))
+    
+    def close(self):
+        """Release the persistent response cache"""
+        self.cache.close()
+    
+    async def arun(
+        self,
+        batch_size: int = 8,
+        progress_callback: Optional[Callable] = None,
+        ideas: Optional[Iterable[Dict[str, Any]]] = None,
+        total: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Async implementation of run(); at most `batch_size` LLM calls in flight
+        
+        Args:
+            ideas: Ideas to evaluate instead of the pending ones in the database;
+                may block while an upstream stage produces them
+            total: Expected number of ideas, for progress reporting with `ideas`
+        """
         logger.info("Starting evaluation pipeline")
         
         # Get active rubrics
@@ -65,55 +92,82 @@ class EvaluationPipeline:
             rubrics=rubrics, 
             provider=self.provider, 
             model_name=self.model_name,
-            model_settings=self.model_settings
+            model_settings=self.model_settings,
+            response_cache=self.cache
         )
         
-        # Get ideas needing evaluation
-        ideas = self.db_manager.get_ideas_for_evaluation()
-        total = len(ideas)
-        
-        if total == 0:
-            logger.info("No ideas need evaluation")
-            return {'processed': 0, 'succeeded': 0, 'failed': 0}
-        
-        logger.info(f"Found {total} ideas for evaluation")
+        if ideas is None:
+            # Get ideas needing evaluation
+            total = self.db_manager.count_ideas_for_evaluation()
+            
+            if total == 0:
+                logger.info("No ideas need evaluation")
+                return {'processed': 0, 'succeeded': 0, 'failed': 0}
+            
+            logger.info(f"Found {total} ideas for evaluation")
+            
+            # Ideas are streamed from the database in keyset-paginated chunks
+            ideas = self.db_manager.iter_ideas_for_evaluation()
         
         succeeded = 0
         failed = 0
         
+        # Results and failures are written in batches rather than one UPDATE per idea
+        self._results = BatchWriter(self.db_manager.update_evaluations_batch, name='evaluation-results')
+        self._failures = BatchWriter(
+            lambda ids: self.db_manager.mark_failed(ids, 'evaluation_status'),
+            name='evaluation-failures'
+        )
+        
         # Process in batches
-        with ThreadPoolExecutor(max_workers=batch_size) as executor:
-            futures = {
-                executor.submit(self._evaluate_idea, idea, evaluator): idea
-                for idea in ideas
-            }
-            
-            for i, future in enumerate(as_completed(futures), 1):
-                idea = futures[future]
+        sem = asyncio.Semaphore(batch_size)
+        
+        async def evaluate(idea: Dict[str, Any]) -> Dict[str, Any]:
+            async with sem:
                 try:
-                    result = future.result()
-                    if result['success']:
-                        succeeded += 1
-                    else:
-                        failed += 1
+                    return await self._evaluate_idea(idea, evaluator)
                 except Exception as e:
                     logger.error(f"Evaluation failed for idea {idea.get('id')}: {e}")
+                    return {'success': False, 'error': str(e)}
+        
+        with self._results, self._failures:
+            # Keep a bounded window of tasks in flight instead of one task per idea up front
+            i = 0
+            
+            async for result in run_windowed(ideas, evaluate, 2 * batch_size):
+                i += 1
+                if result['success']:
+                    succeeded += 1
+                else:
                     failed += 1
                 
                 # Update progress
                 if progress_callback:
-                    progress = int((i / total) * 100)
-                    progress_callback(progress, f'Evaluated {i}/{total} ideas')
+                    if total:
+                        progress = min(int((i / total) * 100), 100)
+                        progress_callback(progress, f'Evaluated {i}/{total} ideas')
+                    else:
+                        progress_callback(0, f'Evaluated {i} ideas')
+        
+        # Results that never reached the database did not succeed
+        lost_results = len(self._results.unwritten)
+        succeeded -= lost_results
+        failed += lost_results
+        write_errors = lost_results + len(self._failures.unwritten)
+        if write_errors:
+            logger.error(f"Evaluation: {write_errors} result(s) could not be written")
         
         logger.info(f"Evaluation complete: {succeeded} succeeded, {failed} failed")
         
         return {
-            'processed': total,
+            'processed': succeeded + failed,
             'succeeded': succeeded,
-            'failed': failed
+            'failed': failed,
+            'write_errors': write_errors,
+            **self.cache.stats()
         }
     
-    def _evaluate_idea(self, idea: Dict[str, Any], evaluator: IdeaEvaluator) -> Dict[str, Any]:
+    async def _evaluate_idea(self, idea: Dict[str, Any], evaluator: IdeaEvaluator) -> Dict[str, Any]:
         """Evaluate a single idea"""
         idea_id = str(idea['id'])
         
@@ -121,10 +175,10 @@ class EvaluationPipeline:
             logger.info(f"Evaluating idea {idea_id}")
             
             # Evaluate the idea
-            evaluation = evaluator.evaluate_idea(idea)
+            evaluation = await evaluator.aevaluate_idea(idea)
             
-            # Update database
-            self.db_manager.update_evaluation(idea_id, evaluation)
+            # Queue database update
+            self._results.add((idea_id, evaluation))
             
             logger.info(f"Evaluation succeeded for idea {idea_id}: {evaluation['weighted_total']:.2f}")
             return {'success': True}
@@ -132,5 +186,5 @@ class EvaluationPipeline:
         except Exception as e:
             logger.error(f"Evaluation error for idea {idea_id}: {e}")
             # Mark as failed
-            self.db_manager.update_status(idea_id, 'evaluation_status', 'failed')
+            self._failures.add(idea_id)
             return {'success': False, 'error': str(e)}
@@ -1,21 +1,66 @@
 """
 Pipeline Orchestrator - Coordinates the evaluation pipeline stages
 """
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Iterable, Iterator, Optional, Callable, Tuple
+import asyncio
+import itertools
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+import threading
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from services.extraction.file_extractor import FileExtractor
 from services.extraction.content_processor import ContentProcessor
 from services.database.db_manager import DatabaseManager
 from .classification_pipeline import ClassificationPipeline
 from .evaluation_pipeline import EvaluationPipeline
+from .batch_writer import BatchWriter
 
 logger = logging.getLogger(__name__)
 
+ADDITIONAL_FILES_ROOT = Path('data/additional_files')
+
+# Stages of a full run, in order; their progress is combined while they overlap
+PIPELINE_STAGES = ('extraction', 'classification', 'evaluation')
+
+# Put on a stage queue once its producer has finished
+_STAGE_DONE = object()
+
+
+def _drain(q: queue.Queue) -> Iterator[Dict[str, Any]]:
+    """Yield items from a stage queue until its producer signals completion"""
+    while True:
+        item = q.get()
+        if item is _STAGE_DONE:
+            return
+        yield item
+
+
+def _backlog_then_queue(backlog: Iterable[Dict[str, Any]], q: queue.Queue) -> Iterator[Dict[str, Any]]:
+    """
+    Yield a stage's database backlog, then the ideas handed on by the upstream stage
+    
+    An idea whose upstream result is written before the backlog page holding
+    it is read shows up in both, at any point until the upstream stage is
+    done; queued ideas already yielded from the backlog are skipped. Only the
+    backlog ids are kept, not those of every queued idea.
+    """
+    backlog_ids = set()
+    for idea in backlog:
+        backlog_ids.add(idea['id'])
+        yield idea
+    
+    for idea in _drain(q):
+        if idea['id'] not in backlog_ids:
+            yield idea
+
 
 class PipelineOrchestrator:
     """Orchestrates the complete evaluation pipeline"""
     
+    # Extraction statuses written per UPDATE
+    STATUS_BATCH_SIZE = 500
+    
     def __init__(
         self,
         db_manager: DatabaseManager,
@@ -49,6 +94,16 @@ class PipelineOrchestrator:
         self.model_name = model_name
         self.model_settings = model_settings or {}
         
+        # Per-idea upload directories live under this root
+        self._files_root = ADDITIONAL_FILES_ROOT
+        
+        # One worker pool reused by every stage run on this orchestrator
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pipeline')
+        
+        # Per-stage progress while a full run has its stages overlapping (None otherwise)
+        self._stage_progress: Optional[Dict[str, int]] = None
+        self._progress_lock = threading.Lock()
+        
         # Initialize pipelines
         self.content_processor = ContentProcessor(file_extractor) if file_extractor else None
         self.classification_pipeline = ClassificationPipeline(
@@ -79,25 +134,49 @@ class PipelineOrchestrator:
             'evaluation': {'processed': 0, 'succeeded': 0, 'failed': 0}
         }
         
+        self._stage_progress = dict.fromkeys(PIPELINE_STAGES, 0)
         try:
-            # Stage 1: Extraction
+            # Stages overlap: an idea moves on as soon as its previous stage's result is written
+            to_classify: queue.Queue = queue.Queue()
+            to_evaluate: queue.Queue = queue.Queue()
+            
+            # Upper bounds for progress: what is already waiting plus what upstream may pass on
+            extraction_total = self.db_manager.count_ideas_for_extraction()
+            classification_total = self.db_manager.count_ideas_for_classification() + extraction_total
+            evaluation_total = self.db_manager.count_ideas_for_evaluation() + classification_total
+            
+            # Stage 1: Extraction (worker pool, driven from its own thread)
+            extraction_error = []
+            
+            def extract():
+                try:
+                    stats['extraction'] = self.run_extraction_stage(on_extracted=to_classify.put)
+                    logger.info(f"Extraction complete: {stats['extraction']}")
+                    self._update_progress('extraction', 100, 'Extraction stage complete')
+                except Exception as e:
+                    extraction_error.append(e)
+                finally:
+                    to_classify.put(_STAGE_DONE)
+            
             self._update_progress('extraction', 0, 'Starting extraction stage')
-            extraction_stats = self.run_extraction_stage()
-            stats['extraction'] = extraction_stats
-            logger.info(f"Extraction complete: {extraction_stats}")
+            extraction_thread = threading.Thread(target=extract, name='pipeline-extraction')
+            extraction_thread.start()
             
-            # Stage 2: Classification
-            self._update_progress('classification', 0, 'Starting classification stage')
-            classification_stats = self.run_classification_stage()
-            stats['classification'] = classification_stats
-            logger.info(f"Classification complete: {classification_stats}")
+            # Stages 2 and 3: Classification and evaluation share one event loop
+            try:
+                stats['classification'], stats['evaluation'] = asyncio.run(self._run_llm_stages(
+                    to_classify, to_evaluate, classification_total, evaluation_total
+                ))
+            finally:
+                extraction_thread.join()
             
-            # Stage 3: Evaluation
-            self._update_progress('evaluation', 0, 'Starting evaluation stage')
-            evaluation_stats = self.run_evaluation_stage()
-            stats['evaluation'] = evaluation_stats
-            logger.info(f"Evaluation complete: {evaluation_stats}")
+            if extraction_error:
+                raise extraction_error[0]
             
+            logger.info(f"Classification complete: {stats['classification']}")
+            logger.info(f"Evaluation complete: {stats['evaluation']}")
+            
+            self._stage_progress = None
             self._update_progress('complete', 100, 'Pipeline complete')
             logger.info("Full pipeline complete")
             
@@ -105,21 +184,66 @@ class PipelineOrchestrator:
             
         except Exception as e:
             logger.error(f"Pipeline failed: {e}")
+            self._stage_progress = None
             self._update_progress('error', 0, f'Pipeline failed: {str(e)}')
             raise
     
-    def run_extraction_stage(self) -> Dict[str, int]:
+    async def _run_llm_stages(
+        self,
+        to_classify: queue.Queue,
+        to_evaluate: queue.Queue,
+        classification_total: int,
+        evaluation_total: int
+    ) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Run classification and evaluation concurrently, each fed by its upstream queue"""
+        
+        async def classify() -> Dict[str, int]:
+            self._update_progress('classification', 0, 'Starting classification stage')
+            try:
+                result = await self.classification_pipeline.arun(
+                    batch_size=self.batch_size,
+                    progress_callback=lambda p, m: self._update_progress('classification', p, m),
+                    ideas=_backlog_then_queue(self.db_manager.iter_ideas_for_classification(), to_classify),
+                    total=classification_total,
+                    on_classified=to_evaluate.put
+                )
+            finally:
+                to_evaluate.put(_STAGE_DONE)
+            self._update_progress('classification', 100, 'Classification stage complete')
+            return result
+        
+        async def evaluate() -> Dict[str, int]:
+            self._update_progress('evaluation', 0, 'Starting evaluation stage')
+            result = await self.evaluation_pipeline.arun(
+                batch_size=self.batch_size,
+                progress_callback=lambda p, m: self._update_progress('evaluation', p, m),
+                ideas=_backlog_then_queue(self.db_manager.iter_ideas_for_evaluation(), to_evaluate),
+                total=evaluation_total
+            )
+            self._update_progress('evaluation', 100, 'Evaluation stage complete')
+            return result
+        
+        classification_stats, evaluation_stats = await asyncio.gather(classify(), evaluate())
+        return classification_stats, evaluation_stats
+    
+    def run_extraction_stage(
+        self,
+        on_extracted: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, int]:
         """
         Run extraction stage for all pending ideas
         
+        Args:
+            on_extracted: Called with each idea once its successful extraction
+                status has been written
+        
         Returns:
             Statistics dictionary
         """
         logger.info("Starting extraction stage")
         
         # Get ideas needing extraction
-        ideas = self.db_manager.get_ideas_for_extraction()
-        total = len(ideas)
+        total = self.db_manager.count_ideas_for_extraction()
         
         if total == 0:
             logger.info("No ideas need extraction")
@@ -130,83 +254,104 @@ class PipelineOrchestrator:
         succeeded = 0
         failed = 0
         
-        # Process in batches
-        with ThreadPoolExecutor(max_workers=self.batch_size) as executor:
+        # Extracted ideas waiting for their status to be written before being handed on
+        awaiting_write: Dict[str, Dict[str, Any]] = {}
+        
+        def hand_on(batch):
+            for idea_id, _ in batch:
+                idea = awaiting_write.pop(idea_id, None)
+                if idea is not None:
+                    on_extracted(idea)
+        
+        # Statuses are written in batches rather than one UPDATE per idea
+        statuses = BatchWriter(
+            self.db_manager.bulk_update_extraction_status,
+            max_batch=self.STATUS_BATCH_SIZE,
+            name='extraction-status',
+            on_written=hand_on if on_extracted else None
+        )
+        
+        # Submit to the shared pool through a sliding window so only 2 * max_workers futures exist at once
+        with statuses:
+            # Ideas are streamed from the database in keyset-paginated chunks
+            pending = self.db_manager.iter_ideas_for_extraction()
             futures = {
-                executor.submit(self._extract_idea, idea): idea
-                for idea in ideas
+                self._executor.submit(self._extract_idea, idea): idea
+                for idea in itertools.islice(pending, 2 * self.max_workers)
             }
+            i = 0
             
-            for i, future in enumerate(as_completed(futures), 1):
-                idea = futures[future]
-                try:
-                    result = future.result()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    idea = futures.pop(future)
+                    i += 1
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Extraction failed for idea {idea.get('id')}: {e}")
+                        result = {'success': False, 'status': 'failed'}
+                    
                     if result['success']:
                         succeeded += 1
+                        if on_extracted:
+                            awaiting_write[str(idea['id'])] = idea
                     else:
                         failed += 1
-                except Exception as e:
-                    logger.error(f"Extraction failed for idea {idea.get('id')}: {e}")
-                    failed += 1
+                    statuses.add((str(idea['id']), result['status']))
+                    
+                    # Update progress
+                    progress = min(int((i / total) * 100), 100)
+                    self._update_progress('extraction', progress, f'Processed {i}/{total} ideas')
                 
-                # Update progress
-                progress = int((i / total) * 100)
-                self._update_progress('extraction', progress, f'Processed {i}/{total} ideas')
+                for idea in itertools.islice(pending, len(done)):
+                    futures[self._executor.submit(self._extract_idea, idea)] = idea
+        
+        # Extractions whose completed status never reached the database did not succeed
+        write_errors = len(statuses.unwritten)
+        lost_completions = sum(1 for _, status in statuses.unwritten if status == 'completed')
+        succeeded -= lost_completions
+        failed += lost_completions
+        if write_errors:
+            logger.error(f"Extraction: {write_errors} status(es) could not be written")
         
         return {
-            'processed': total,
+            'processed': succeeded + failed,
             'succeeded': succeeded,
-            'failed': failed
+            'failed': failed,
+            'write_errors': write_errors
         }
     
     def _extract_idea(self, idea: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract content from a single idea"""
+        """Extract content from a single idea; the caller records the returned status"""
         idea_id = str(idea['id'])
         
         try:
             logger.info(f"Extracting content for idea {idea_id}")
             
             # Get files directory for this idea
-            from pathlib import Path
-            files_dir = Path(f'data/additional_files/{idea_id}')
+            files_dir = self._files_root / idea_id
             
             # Process files for this idea
             result = self.content_processor.process_idea_files(idea_id, files_dir)
             
             if result.get('status') == 'no_files':
                 # No files to process, mark as completed with empty content
-                self.db_manager.update_extraction_status(
-                    idea_id=idea_id,
-                    status='completed'
-                )
                 logger.info(f"No files found for idea {idea_id}, marked as completed")
-                return {'success': True}
+                return {'success': True, 'status': 'completed'}
             
             if result.get('extracted_content'):
-                # Update database with extracted content
-                # Note: update_extraction_status needs to be updated to accept these params
-                self.db_manager.update_extraction_status(
-                    idea_id=idea_id,
-                    status='completed'
-                )
                 logger.info(f"Extraction succeeded for idea {idea_id}")
-                return {'success': True}
+                return {'success': True, 'status': 'completed'}
             else:
                 # Mark as completed with no content
-                self.db_manager.update_extraction_status(
-                    idea_id=idea_id,
-                    status='completed'
-                )
                 logger.info(f"Extraction completed for idea {idea_id} (no content)")
-                return {'success': True}
+                return {'success': True, 'status': 'completed'}
                 
         except Exception as e:
             logger.error(f"Extraction error for idea {idea_id}: {e}")
-            self.db_manager.update_extraction_status(
-                idea_id=idea_id,
-                status='failed'
-            )
-            return {'success': False, 'error': str(e)}
+            return {'success': False, 'status': 'failed', 'error': str(e)}
     
     def run_classification_stage(self) -> Dict[str, int]:
         """
@@ -235,13 +380,34 @@ class PipelineOrchestrator:
         )
     
     def _update_progress(self, stage: str, progress: int, message: str):
-        """Update progress via callback"""
-        if self.progress_callback:
-            self.progress_callback({
-                'stage': stage,
-                'progress': progress,
-                'message': message
-            })
+        """
+        Update progress via callback
+        
+        While a full run's stages overlap, the reported stage is the earliest
+        unfinished one and the progress is the mean of all stages; the
+        per-stage values are included under 'stages'.
+        """
+        if not self.progress_callback:
+            return
+        
+        update = {'stage': stage, 'progress': progress, 'message': message}
+        
+        stage_progress = self._stage_progress
+        if stage_progress is not None and stage in stage_progress:
+            with self._progress_lock:
+                stage_progress[stage] = progress
+                stages = dict(stage_progress)
+            update['stage'] = next((s for s in PIPELINE_STAGES if stages[s] < 100), PIPELINE_STAGES[-1])
+            update['progress'] = sum(stages.values()) // len(stages)
+            update['stages'] = stages
+        
+        self.progress_callback(update)
+    
+    def close(self):
+        """Shut down the worker pool and release the stages' caches once the orchestrator is no longer needed"""
+        self._executor.shutdown(wait=True)
+        self.classification_pipeline.close()
+        self.evaluation_pipeline.close()
     
     def get_pipeline_stats(self) -> Dict[str, Any]:
         """Get overall pipeline statistics"""
@@ -0,0 +1,105 @@
+"""
+Stage Cache - Persistent store for pipeline LLM responses
+"""
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Dict, Iterator
+import logging
+import sqlite3
+import threading
+import time
+import orjson
+
+logger = logging.getLogger(__name__)
+
+STAGE_CACHE_PATH = Path.home() / '.cache' / 'hackathon' / 'stage_cache.sqlite3'
+STAGE_CACHE_TTL = 30 * 24 * 3600  # seconds
+
+
+class StageCache(MutableMapping):
+    """
+    SQLite-backed response cache for one pipeline stage
+    
+    Pass it as `cache=` to llm_service.chat_completion, which reads and
+    writes it from a worker thread, and close() it when done. Keys are the LLM
+    service's hash of the full request (idea content, prompt, model and
+    settings), so a changed idea, rubric or model config is simply a miss
+    and old entries age out after STAGE_CACHE_TTL. Results survive restarts,
+    so re-running the pipeline over unchanged ideas skips the LLM calls.
+    """
+    
+    def __init__(self, stage: str, path: Path = STAGE_CACHE_PATH, ttl: float = STAGE_CACHE_TTL):
+        """
+        Args:
+            stage: Stage name; entries of different stages never collide
+            path: SQLite database file (shared by all stages)
+            ttl: Seconds an entry stays valid
+        """
+        self.stage = stage
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS stage_cache (
+                stage TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (stage, key)
+            )
+        """)
+    
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM stage_cache WHERE stage = ? AND key = ? AND created_at > ?",
+                (self.stage, key, time.time() - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                raise KeyError(key)
+            self.hits += 1
+        return orjson.loads(row[0])
+    
+    def __setitem__(self, key: str, value: Dict[str, Any]):
+        payload = orjson.dumps(value, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stage_cache (stage, key, value, created_at) VALUES (?, ?, ?, ?)",
+                (self.stage, key, payload, time.time())
+            )
+    
+    def __delitem__(self, key: str):
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM stage_cache WHERE stage = ? AND key = ?", (self.stage, key)
+            )
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute(
+                "SELECT key FROM stage_cache WHERE stage = ?", (self.stage,)
+            )]
+        return iter(keys)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM stage_cache WHERE stage = ?", (self.stage,)
+            ).fetchone()[0]
+    
+    def close(self):
+        """Close the SQLite connection"""
+        with self._lock:
+            self._conn.close()
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counts since this cache was opened"""
+        return {'cache_hits': self.hits, 'cache_misses': self.misses}
@@ -0,0 +1,51 @@
+"""
+Task Window - Bounded concurrent processing of a (possibly blocking) item source
+"""
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable
+import asyncio
+
+
+async def run_windowed(
+    items: Iterable[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    size: int
+) -> AsyncIterator[Any]:
+    """
+    Run `worker` over `items` with at most `size` tasks in flight
+    
+    Yields each task's result as soon as it finishes. Items are pulled on a
+    worker thread, since the source may block while an upstream stage
+    produces; finished tasks keep being yielded while that pull waits.
+    """
+    source = iter(items)
+    inflight = set()
+    fetch = None
+    exhausted = False
+    
+    try:
+        while True:
+            # One pull at a time, only while the window has room
+            if fetch is None and not exhausted and len(inflight) < size:
+                fetch = asyncio.ensure_future(asyncio.to_thread(next, source, None))
+            
+            waiting = (inflight | {fetch}) if fetch is not None else inflight
+            if not waiting:
+                return
+            
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            
+            if fetch in done:
+                done.discard(fetch)
+                item = fetch.result()
+                fetch = None
+                if item is None:
+                    exhausted = True
+                else:
+                    inflight.add(asyncio.create_task(worker(item)))
+            
+            for task in done:
+                inflight.discard(task)
+                yield task.result()
+    finally:
+        for task in inflight:
+            task.cancel()
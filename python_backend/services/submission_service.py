@@ -1,20 +1,55 @@
 """
 Submission Service - handles idea submissions
 """
+import asyncio
 import io
-import csv
-from typing import Dict, List, Any, Optional
+import logging
+from typing import Dict, List, Any, Optional, Set
 from datetime import datetime
 import openpyxl
 import pandas as pd
 
-from config.database import get_db_connection
-from services.csv_processor import CSVProcessor, ProcessingResult
+from psycopg2.extras import RealDictCursor, execute_values
+
+from config.database import execute_prepared, get_db_connection
+from services.csv_processor import CSVProcessor, ProcessingResult, HEADER_MAP
+
+logger = logging.getLogger(__name__)
+
+
+# hackathon_ideas columns written for each submitted idea
+IDEA_INSERT_COLUMNS = (
+    'submission_id', 'idea_title', 'brief_summary', 'detailed_description',
+    'challenge_opportunity', 'novelty_benefits_risks', 'responsible_ai_adherence',
+    'additional_documentation', 'supporting_artefacts', 'second_file_upload',
+    'preferred_week', 'build_phase_preference', 'build_preference',
+    'code_development_preference', 'submitter_email'
+)
+
+IDEA_INSERT_PAGE_SIZE = 500
+
+# Submissions larger than this are loaded with COPY instead of INSERT
+IDEA_COPY_THRESHOLD = 1000
+
+# Characters that must be backslash-escaped in COPY text format
+COPY_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+# ZIP local-file header that every XLSX file starts with
+XLSX_MAGIC = b'PK\x03\x04'
+
+# Single-idea insert, run as a server-side prepared statement
+INSERT_IDEA_SQL = (
+    f"INSERT INTO hackathon_ideas ({', '.join(IDEA_INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join(f'${i}' for i in range(1, len(IDEA_INSERT_COLUMNS) + 1))}) "
+    "RETURNING id"
+)
 
 
 class SubmissionService:
     def __init__(self):
         self.csv_processor = CSVProcessor()
+        # Strong references to fire-and-forget tasks until they finish
+        self._background_tasks: Set[asyncio.Task] = set()
     
     async def process_submission_from_buffer(
         self,
@@ -34,11 +69,11 @@ class SubmissionService:
                 # Begin transaction
                 cursor.execute("BEGIN")
                 
-                print(f"Received file buffer of {len(file_buffer)} bytes")
+                logger.debug("Received file buffer of %d bytes", len(file_buffer))
                 
                 # Parse file based on type
                 csv_data = await self.parse_file_buffer(file_buffer, file_type)
-                print(f"Parsed {len(csv_data)} data rows from file")
+                logger.debug("Parsed %d data rows from file", len(csv_data))
                 
                 # Process CSV
                 processing_result = await self.csv_processor.process_rows(csv_data)
@@ -86,8 +121,8 @@ class SubmissionService:
                 # Commit transaction
                 cursor.execute("COMMIT")
                 
-                # Emit events (mock)
-                await self.emit_events(submission_id, processing_result)
+                # Emit events (mock) without holding up the response
+                self._run_in_background(self.emit_events(submission_id, processing_result))
                 
                 return {
                     'submission_id': submission_id,
@@ -108,13 +143,9 @@ class SubmissionService:
         
         # Detect file type if not provided
         if not file_type:
-            # Check for XLSX magic number (PK\x03\x04)
-            if file_buffer[0:2] == b'PK':
-                file_type = 'xlsx'
-            else:
-                file_type = 'csv'
+            file_type = 'xlsx' if file_buffer.startswith(XLSX_MAGIC) else 'csv'
         
-        print(f"Detected file type: {file_type}")
+        logger.debug("Detected file type: %s", file_type)
         
         if file_type in ['xlsx', 'xls']:
             return await self.parse_xlsx_buffer(file_buffer)
@@ -123,93 +154,133 @@ class SubmissionService:
     
     async def parse_xlsx_buffer(self, buffer: bytes) -> List[Dict]:
         """Parse XLSX file buffer"""
-        print('Parsing XLSX file...')
-        
-        # Read workbook from buffer
-        workbook = openpyxl.load_workbook(io.BytesIO(buffer))
-        sheet = workbook.active
+        logger.debug('Parsing XLSX file...')
         
-        # Get headers from first row
-        headers = [cell.value.lower().strip() if cell.value else '' for cell in sheet[1]]
+        data = await asyncio.to_thread(self._read_xlsx, buffer)
         
-        # Parse data rows
-        data = []
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            row_dict = {}
-            for i, value in enumerate(row):
-                if i < len(headers):
-                    row_dict[headers[i]] = str(value) if value is not None else ''
-            data.append(row_dict)
-        
-        print(f"Parsed {len(data)} rows from XLSX")
+        logger.debug("Parsed %d rows from XLSX", len(data))
         return data
     
+    def _read_xlsx(self, buffer: bytes) -> List[Dict]:
+        # Read-only mode streams rows from the sheet XML instead of building every cell object
+        workbook = openpyxl.load_workbook(io.BytesIO(buffer), read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            
+            # Get headers from first row
+            headers = [self._field_name(value) if value else '' for value in next(rows, ())]
+            
+            # Parse data rows (headers were normalized once above)
+            return [
+                dict(zip(headers, ['' if value is None else str(value) for value in row]))
+                for row in rows
+            ]
+        finally:
+            workbook.close()
+    
     async def parse_csv_buffer(self, buffer: bytes) -> List[Dict]:
         """Parse CSV file buffer"""
-        print('Parsing CSV file...')
-        
-        csv_text = buffer.decode('utf-8')
-        print(f"CSV text length: {len(csv_text)} characters")
-        
-        # Parse CSV
-        csv_reader = csv.DictReader(io.StringIO(csv_text))
-        data = []
+        logger.debug("Parsing CSV file (%d bytes)...", len(buffer))
         
-        for row in csv_reader:
-            # Normalize keys to lowercase
-            normalized_row = {k.lower().strip(): v for k, v in row.items()}
-            data.append(normalized_row)
+        # pandas' C tokenizer, off the event loop
+        data = await asyncio.to_thread(self._read_csv, buffer)
         
-        print(f"Parsed {len(data)} rows from CSV")
+        logger.debug("Parsed %d rows from CSV", len(data))
         return data
     
+    def _read_csv(self, buffer: bytes) -> List[Dict]:
+        df = pd.read_csv(
+            io.BytesIO(buffer),
+            dtype=str,
+            keep_default_na=False,
+            encoding='utf-8',
+            engine='c'
+        )
+        
+        # Normalize keys to lowercase field names
+        df.columns = [self._field_name(column) for column in df.columns]
+        return df.to_dict('records')
+    
+    @staticmethod
+    def _field_name(header: str) -> str:
+        """Map a file header to its short field name (unknown headers are just lowercased)"""
+        key = header.lower().strip()
+        return HEADER_MAP.get(key, key)
+    
     async def create_ideas_in_batches(self, cursor, submission_id: str, rows: List[Dict]):
-        """Create idea records in batches"""
-        batch_size = 100
+        """Create idea records with multi-row INSERTs, or COPY for large submissions"""
+        values = [self._idea_values(submission_id, row) for row in rows]
         
-        for i in range(0, len(rows), batch_size):
-            batch = rows[i:i + batch_size]
-            
-            for row in batch:
-                cursor.execute("""
-                    INSERT INTO hackathon_ideas (
-                        submission_id, idea_title, brief_summary, detailed_description,
-                        challenge_opportunity, novelty_benefits_risks, responsible_ai_adherence, 
-                        additional_documentation, supporting_artefacts, second_file_upload, 
-                        preferred_week, build_phase_preference, build_preference, 
-                        code_development_preference, submitter_email
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    submission_id,
-                    row.get('your idea title', ''),
-                    row.get('brief summary of your idea', ''),
-                    row.get('brief summary of your idea', ''),  # detailed_description (same as brief for now)
-                    row.get('challenge/business opportunity being addressed and the ability to scale it across tcs and multiple customers.'),
-                    row.get('novelty of the idea, benefits and risks.'),
-                    row.get('highlight adherence to responsible ai principles such as security, fairness, privacy & legal compliance.'),
-                    row.get('additional documentation – any additional information or prototype explaining technical approach, architecture, development timeline, success metrics and expected outcomes, and scalability potential. you can also share any research done on business model, competitive analysis, risk & mitigations. sharing relevant artefacts will boost your scores.'),
-                    row.get('additional documentation – any additional information or prototype explaining technical approach, architecture, development timeline, success metrics and expected outcomes, and scalability potential. you can also share any research done on business model, competitive analysis, risk & mitigations. sharing relevant artefacts will boost your scores.'),
-                    row.get('incase you have a second file that could further illustrate your solution, kindly upload the same here.'),
-                    row.get('your preferred week of participation'),
-                    row.get('your preference for build phase'),
-                    row.get('your preference on how you want to  build your idea'),
-                    row.get('your preference if you were to develop code'),
-                    row.get('email', '')
-                ))
+        if len(values) > IDEA_COPY_THRESHOLD:
+            self._copy_ideas(cursor, values)
+            return
+        
+        execute_values(
+            cursor,
+            f"INSERT INTO hackathon_ideas ({', '.join(IDEA_INSERT_COLUMNS)}) VALUES %s",
+            values,
+            page_size=IDEA_INSERT_PAGE_SIZE
+        )
     
-    async def emit_events(self, submission_id: str, result: ProcessingResult):
-        """Emit events (mock implementation)"""
-        print('Event: IdeaSubmission.Validated', {
-            'submission_id': submission_id,
-            'valid_rows': len(result.valid_rows),
-            'invalid_rows': len(result.invalid_rows),
-        })
+    @staticmethod
+    def _idea_values(submission_id: str, row: Dict) -> tuple:
+        """Parsed row -> values in IDEA_INSERT_COLUMNS order (shared fields looked up once)"""
+        summary = row.get('brief_summary', '')
+        documentation = row.get('additional_documentation')
+        return (
+            submission_id,
+            row.get('idea_title', ''),
+            summary,
+            summary,  # detailed_description (same as brief for now)
+            row.get('challenge_opportunity'),
+            row.get('novelty_benefits_risks'),
+            row.get('responsible_ai_adherence'),
+            documentation,
+            documentation,  # supporting_artefacts
+            row.get('second_file_upload'),
+            row.get('preferred_week'),
+            row.get('build_phase_preference'),
+            row.get('build_preference'),
+            row.get('code_development_preference'),
+            row.get('submitter_email', '')
+        )
+    
+    def _copy_ideas(self, cursor, values: List[tuple]):
+        """Bulk-load idea rows with COPY FROM STDIN (text format, NULL as \\N)"""
+        buffer = io.StringIO()
+        for row in values:
+            buffer.write('\t'.join(
+                '\\N' if value is None else str(value).translate(COPY_TEXT_ESCAPES)
+                for value in row
+            ))
+            buffer.write('\n')
+        buffer.seek(0)
         
-        print('Event: Idea.BulkCreated', {
-            'submission_id': submission_id,
-            'count': len(result.valid_rows),
-        })
+        cursor.copy_expert(
+            f"COPY hackathon_ideas ({', '.join(IDEA_INSERT_COLUMNS)}) FROM STDIN",
+            buffer
+        )
+    
+    def _run_in_background(self, coro):
+        """Schedule a coroutine without awaiting it"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def emit_events(self, submission_id: str, result: ProcessingResult):
+        """Emit events (mock implementation); runs in the background, so never raises"""
+        try:
+            logger.info(
+                "Event: IdeaSubmission.Validated submission_id=%s valid_rows=%d invalid_rows=%d",
+                submission_id, len(result.valid_rows), len(result.invalid_rows)
+            )
+            
+            logger.info(
+                "Event: Idea.BulkCreated submission_id=%s count=%d",
+                submission_id, len(result.valid_rows)
+            )
+        except Exception:
+            logger.exception("Failed to emit events for submission %s", submission_id)
     
     async def submit_single_idea(
         self,
@@ -226,10 +297,12 @@ class SubmissionService:
                 cursor.execute("BEGIN")
                 
                 # Validate required fields
-                if not idea_data.get('title') or len(idea_data['title'].strip()) < 5:
+                title = (idea_data.get('title') or '').strip()
+                if len(title) < 5:
                     raise ValueError('Title is required and must be at least 5 characters')
                 
-                if not idea_data.get('brief_summary') or len(idea_data['brief_summary'].strip()) < 10:
+                summary = (idea_data.get('brief_summary') or '').strip()
+                if len(summary) < 10:
                     raise ValueError('Brief summary is required and must be at least 10 characters')
                 
                 # Create submission record
@@ -243,22 +316,12 @@ class SubmissionService:
                 
                 submission_id = cursor.fetchone()[0]
                 
-                # Insert idea
-                cursor.execute("""
-                    INSERT INTO hackathon_ideas (
-                        submission_id, idea_title, brief_summary, detailed_description,
-                        challenge_opportunity, novelty_benefits_risks, responsible_ai_adherence, 
-                        additional_documentation, supporting_artefacts, second_file_upload, 
-                        preferred_week, build_phase_preference, build_preference, 
-                        code_development_preference, submitter_email
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (
+                # Insert idea (prepared once per pooled connection)
+                execute_prepared(cursor, 'insert_idea', INSERT_IDEA_SQL, (
                     submission_id,
-                    idea_data['title'],
-                    idea_data['brief_summary'],
-                    idea_data['brief_summary'],  # detailed_description
+                    title,
+                    summary,
+                    summary,  # detailed_description
                     idea_data.get('challenge_opportunity'),
                     idea_data.get('novelty_benefits_risks'),
                     idea_data.get('responsible_ai_adherence'),
@@ -276,7 +339,7 @@ class SubmissionService:
                 
                 cursor.execute("COMMIT")
                 
-                print(f"Single idea submitted: {idea_id}")
+                logger.info("Single idea submitted: %s", idea_id)
                 
                 return {'idea_id': idea_id}
                 
@@ -290,7 +353,9 @@ class SubmissionService:
         """Get all ideas for admin dashboard"""
         
         with get_db_connection() as conn:
-            cursor = conn.cursor()
+            # Server-side cursor: rows stream in itersize chunks as dicts
+            cursor = conn.cursor(name='get_all_ideas', cursor_factory=RealDictCursor)
+            cursor.itersize = 200
             
             cursor.execute("""
                 SELECT 
@@ -303,11 +368,7 @@ class SubmissionService:
                 LIMIT 1000
             """)
             
-            columns = [desc[0] for desc in cursor.description]
-            results = []
-            
-            for row in cursor.fetchall():
-                results.append(dict(zip(columns, row)))
+            results = list(cursor)
             
             cursor.close()
             return results
@@ -337,34 +398,16 @@ class SubmissionService:
     async def delete_submission(self, submission_id: str, user_id: str) -> bool:
         """Delete a submission and all associated ideas"""
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
+        # Ownership check and delete in one statement; hackathon_ideas rows go
+        # with it through the ON DELETE CASCADE foreign key
+        with get_db_connection() as conn, conn, conn.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM idea_submissions WHERE id = %s AND submitter_id = %s RETURNING id",
+                (submission_id, user_id)
+            )
             
-            try:
-                cursor.execute("BEGIN")
-                
-                # Verify ownership
-                cursor.execute(
-                    "SELECT id FROM idea_submissions WHERE id = %s AND submitter_id = %s",
-                    (submission_id, user_id)
-                )
-                
-                if cursor.fetchone() is None:
-                    raise ValueError('Submission not found or unauthorized')
-                
-                # Delete ideas
-                cursor.execute("DELETE FROM ideas WHERE submission_id = %s", (submission_id,))
-                
-                # Delete submission
-                cursor.execute("DELETE FROM idea_submissions WHERE id = %s", (submission_id,))
-                
-                cursor.execute("COMMIT")
-                
-                print(f"Deleted submission {submission_id} and all associated ideas")
-                return True
-                
-            except Exception as e:
-                cursor.execute("ROLLBACK")
-                raise e
-            finally:
-                cursor.close()
+            if cursor.fetchone() is None:
+                raise ValueError('Submission not found or unauthorized')
+        
+        logger.info("Deleted submission %s and all associated ideas", submission_id)
+        return True